@@ -7,6 +7,7 @@ Efficiently schedules scraping across different cities and markets
 import time
 import schedule
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import random
@@ -18,10 +19,17 @@ from scraper.comprehensive_multi_city_scraper import (
     MARKET_CONFIGS
 )
 
+# Scheduled jobs run on worker threads, so a long scrape doesn't hold back the
+# markets due after it; each scraper opens its own browser on its thread
+MAX_PARALLEL_JOBS = 4
+
 class MultiCityScheduler:
     def __init__(self):
         self.schedule_config = self.load_schedule_config()
         self.last_run_times = {}
+        self.executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_JOBS)
+        # Future of the last submitted run per job and arguments
+        self.in_flight = {}
         
     def load_schedule_config(self) -> Dict:
         """Load scheduling configuration"""
@@ -177,6 +185,27 @@ class MultiCityScheduler:
         except Exception as e:
             print(f"❌ Error in comprehensive scraping: {e}")
     
+    def submit_job(self, job, *args):
+        """Hands a due job to the worker pool and returns immediately"""
+        key = (job.__name__, args)
+        running = self.in_flight.get(key)
+        if running and not running.done():
+            # A slow run would otherwise overlap with the next one for the same market
+            print(f"⏭️ {job.__name__}{args} still running, skipping this run")
+            return
+        future = self.executor.submit(job, *args)
+        future.add_done_callback(lambda f: self.report_job_failure(key, f))
+        self.in_flight[key] = future
+    
+    def report_job_failure(self, key, future):
+        """Prints what a worker job raised, which would otherwise be lost with its future"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            name, args = key
+            print(f"❌ Job {name}{args} failed: {error!r}")
+    
     def setup_schedules(self):
         """Set up all scheduled jobs"""
         print("⏰ Setting up multi-city multi-market schedules...")
@@ -194,14 +223,14 @@ class MultiCityScheduler:
             
             if MARKET_CONFIGS[market_name]["city_support"]:
                 if frequency == "daily":
-                    schedule.every().day.at(time_str).do(self.run_city_supporting_market, market_name)
+                    schedule.every().day.at(time_str).do(self.submit_job, self.run_city_supporting_market, market_name)
                 elif frequency == "weekly":
-                    schedule.every().week.at(time_str).do(self.run_city_supporting_market, market_name)
+                    schedule.every().week.at(time_str).do(self.submit_job, self.run_city_supporting_market, market_name)
             else:
                 if frequency == "daily":
-                    schedule.every().day.at(time_str).do(self.run_single_location_market, market_name)
+                    schedule.every().day.at(time_str).do(self.submit_job, self.run_single_location_market, market_name)
                 elif frequency == "weekly":
-                    schedule.every().week.at(time_str).do(self.run_single_location_market, market_name)
+                    schedule.every().week.at(time_str).do(self.submit_job, self.run_single_location_market, market_name)
         
         # Schedule comprehensive weekly run
         comprehensive_config = self.schedule_config["comprehensive_runs"]
@@ -210,9 +239,9 @@ class MultiCityScheduler:
             time_str = comprehensive_config.get("time", "08:00")
             
             if day == "sunday":
-                schedule.every().sunday.at(time_str).do(self.run_comprehensive_weekly)
+                schedule.every().sunday.at(time_str).do(self.submit_job, self.run_comprehensive_weekly)
             elif day == "monday":
-                schedule.every().monday.at(time_str).do(self.run_comprehensive_weekly)
+                schedule.every().monday.at(time_str).do(self.submit_job, self.run_comprehensive_weekly)
             # Add more days as needed
         
         print(f"✅ Scheduled {len(schedule.jobs)} jobs")
@@ -265,6 +294,9 @@ class MultiCityScheduler:
             print("\n⏹️ Scheduler stopped by user")
         except Exception as e:
             print(f"\n❌ Scheduler error: {e}")
+        finally:
+            # Let running scrapes finish, but don't start queued ones
+            self.executor.shutdown(wait=True, cancel_futures=True)
 
 def main():
     """Main function"""
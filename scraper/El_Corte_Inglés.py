@@ -1,27 +1,45 @@
 import time
 import re
 from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price, supabase
+from utils.db import upsert_products, check_connection
 from utils.logger import log_debug_message as log
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot
+from utils.browser import block_heavy_resources
 
 BASE_URL = "https://www.elcorteingles.es/supermercado"
-
-print("START El Corte Inglés scraper starting...")
-
-# Test Supabase connection at startup
-print("RETRY Checking Supabase connection...")
-try:
-    test = supabase.table("products").select("count").limit(1).execute()
-    print("SUCCESS Supabase connection successful")
-except Exception as e:
-    print(f"ERROR Supabase connection failed: {str(e)}")
-    print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
-    exit(1)
-
-def save_debug_html(html, filename="elcorte_debug.html"):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"SUCCESS HTML saved as {filename}")
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+
+# Collects name/price/quantity text for every product card inside the browser.
+# Card selectors are tried in order, the first one that matches anything wins.
+EXTRACT_PRODUCTS_JS = """() => {
+    const cardSelectors = ['.product-card', '[data-test="product-card"]', '[class*="product"]', 'article'];
+    let cards = [];
+    for (const sel of cardSelectors) {
+        cards = document.querySelectorAll(sel);
+        if (cards.length) break;
+    }
+    const first = (el, sels) => {
+        for (const sel of sels) {
+            const found = el.querySelector(sel);
+            if (found) return found.innerText.trim();
+        }
+        return '';
+    };
+    return Array.from(cards).map(el => ({
+        name: first(el, ['.product-card__title', '[data-test="product-title"]', '.product-title', '.product-name', 'h3', 'h2', 'a']),
+        price: first(el, ['.price', '[data-test="product-price"]', '.product-price', '[class*="price"]', 'span[class*="Price"]', '[class*="cost"]']),
+        quantity: first(el, ['.product-card__description', '[class*="quantity"]', '[class*="weight"]']),
+    }));
+}"""
+
+COUNT_CARDS_JS = """sels => {
+    for (const sel of sels) {
+        const n = document.querySelectorAll(sel).length;
+        if (n) return n;
+    }
+    return 0;
+}"""
+SCROLL_CARD_SELECTORS = ['.product-card', '[data-test="product-card"]', '[class*="product"]']
 
 def extract_elcorte_products(page, category):
     """Extract products from El Corte Inglés main page"""
@@ -39,62 +57,34 @@ def extract_elcorte_products(page, category):
             except Exception:
                 print("WARN All product selectors failed")
 
-    # Find all product elements
-    product_elements = page.query_selector_all('.product-card')
-    if not product_elements:
-        product_elements = page.query_selector_all('[data-test="product-card"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('[class*="product"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('article')
-    
-    if not product_elements:
+    # Read every card in one round trip instead of one CDP call per product
+    cards = page.evaluate(EXTRACT_PRODUCTS_JS)
+
+    if not cards:
         print("ERROR No product elements found")
-        page.screenshot(path="elcorte_debug.png", full_page=True)
-        with open("elcorte_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("📸 Screenshot saved to elcorte_debug.png, HTML saved to elcorte_debug.html")
+        if DEBUG_ENABLED:
+            save_debug_screenshot(page, "elcorte_debug.png")
+            save_debug_html(page.content(), "elcorte_debug.html")
         return []
 
-    print(f"🔎 Found {len(product_elements)} products.")
+    print(f"🔎 Found {len(cards)} products.")
 
     results = []
-    for i, el in enumerate(product_elements, 1):
+    for i, data in enumerate(cards, 1):
         try:
-            # Extract product name
-            name_el = el.query_selector('.product-card__title') or \
-                     el.query_selector('[data-test="product-title"]') or \
-                     el.query_selector('.product-title') or \
-                     el.query_selector('.product-name') or \
-                     el.query_selector('h3') or \
-                     el.query_selector('h2') or \
-                     el.query_selector('a')
-            
-            if not name_el:
-                print(f"WARN Skipped product {i}: Could not find name")
-                continue
-            name = name_el.inner_text().strip()
-            
+            name = data["name"]
             if not name:
-                print(f"WARN Skipped product {i}: Empty name")
+                print(f"WARN Skipped product {i}: Could not find name")
                 continue
 
-            # Extract price
-            price_el = el.query_selector('.price') or \
-                      el.query_selector('[data-test="product-price"]') or \
-                      el.query_selector('.product-price') or \
-                      el.query_selector('[class*="price"]') or \
-                      el.query_selector('span[class*="Price"]') or \
-                      el.query_selector('[class*="cost"]')
-            
-            if not price_el:
+            price_text = data["price"]
+            if not price_text:
                 print(f"WARN Skipped product {i}: Could not find price")
                 continue
-                
-            price_text = price_el.inner_text().strip()
+
             try:
                 # Extract numeric value from price text
-                price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
+                price_match = PRICE_RE.search(price_text)
                 if price_match:
                     price = float(price_match.group(1).replace(',', '.'))
                 else:
@@ -104,16 +94,10 @@ def extract_elcorte_products(page, category):
                 print(f"WARN Skipped product {i}: Could not parse price")
                 continue
 
-            # Extract quantity (if available)
-            quantity_el = el.query_selector('.product-card__description') or \
-                         el.query_selector('[class*="quantity"]') or \
-                         el.query_selector('[class*="weight"]')
-            quantity = quantity_el.inner_text().strip() if quantity_el else "1 unit"
-
             results.append({
                 "name": name,
                 "price": price,
-                "quantity": quantity,
+                "quantity": data["quantity"] or "1 unit",
                 "category": category,
             })
         except Exception as e:
@@ -122,12 +106,16 @@ def extract_elcorte_products(page, category):
 
 def scrape_elcorte():
     print("START Starting El Corte Inglés scraper...")
+    if not check_connection():
+        return
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
+        browser = p.chromium.launch(headless=not DEBUG_ENABLED, channel="chromium")
         page = browser.new_page(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 800}
         )
+        # new_page() gives the page its own context, block resources on that
+        block_heavy_resources(page.context)
 
         try:
             print("GLOBE Visiting El Corte Inglés homepage...")
@@ -188,18 +176,21 @@ def scrape_elcorte():
 
             # Scroll to load more products
             print("SCROLL Scrolling to load products...")
+            last_count = 0
+            stalled = 0
             for i in range(15):
                 page.mouse.wheel(0, 1000)
                 time.sleep(0.5)
-                
-                # Check if more products loaded
-                current_products = page.query_selector_all('.product-card')
-                if not current_products:
-                    current_products = page.query_selector_all('[data-test="product-card"]')
-                if not current_products:
-                    current_products = page.query_selector_all('[class*="product"]')
+
+                # Check if more products loaded: one count in the page instead of
+                # up to three query_selector_all round trips returning handles
+                count = page.evaluate(COUNT_CARDS_JS, SCROLL_CARD_SELECTORS)
                 if i % 5 == 0:
-                    print(f"CHART Found {len(current_products)} products so far...")
+                    print(f"CHART Found {count} products so far...")
+                stalled = stalled + 1 if count == last_count else 0
+                last_count = count
+                if stalled >= 2:
+                    break
 
             # Wait for any remaining dynamic content
             print("WAIT Waiting for dynamic content to load...")
@@ -210,7 +201,7 @@ def scrape_elcorte():
             time.sleep(2)
 
             page.wait_for_timeout(3000)
-            page.screenshot(path="elcorte_debug.png", full_page=True)
+            save_debug_screenshot(page, "elcorte_debug.png")
 
             products = extract_elcorte_products(page, "despensa")
             if not products:
@@ -218,20 +209,9 @@ def scrape_elcorte():
                 return
 
             print(f"BOX Processing {len(products)} products...")
-            for i, product in enumerate(products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "elcorte")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "elcorte", product["quantity"])
-                        print(f"SUCCESS [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR DB error on product {i}: {e}")
+            # One bulk lookup and a few bulk writes instead of two requests per product
+            inserted, updated, unchanged = upsert_products(products, "elcorte")
+            print(f"SUCCESS {inserted} inserted, {updated} price updates, {unchanged} unchanged")
 
         except Exception as e:
             print(f"ERROR Scraping failed: {e}")
@@ -1,6 +1,8 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price
+from utils.db import upsert_products
 from utils.logger import log_debug_message
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot
+from utils.browser import block_heavy_resources
 import time
 import re
 
@@ -8,6 +10,8 @@ BASE_URL = "https://www.compraonline.alcampo.es"
 CATEGORY_PATH = "/supermercado/verduras-y-hortalizas"
 OUTPUT_HTML = "alcampo_debug.html"
 OUTPUT_PNG = "alcampo_debug.png"
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+EURO_PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)\s*€')
 
 def extract_alcampo_products(page, category):
     """Extract products from Alcampo category page"""
@@ -70,10 +74,9 @@ def extract_alcampo_products(page, category):
     
     if not product_elements:
         print("ERROR: No product elements found with any selector")
-        page.screenshot(path=OUTPUT_PNG, full_page=True)
-        with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print(f"📸 Screenshot saved to {OUTPUT_PNG}, HTML saved to {OUTPUT_HTML}")
+        if DEBUG_ENABLED:
+            save_debug_screenshot(page, OUTPUT_PNG)
+            save_debug_html(page.content(), OUTPUT_HTML)
         return []
 
     print(f"🔎 Found {len(product_elements)} products.")
@@ -156,7 +159,7 @@ def extract_alcampo_products(page, category):
                     if '€' in price_text or 'EUR' in price_text or 'euro' in price_text.lower():
                         try:
                             # Extract numeric value from price text
-                            price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
+                            price_match = PRICE_RE.search(price_text)
                             if price_match:
                                 price = float(price_match.group(1).replace(',', '.'))
                                 break
@@ -166,7 +169,7 @@ def extract_alcampo_products(page, category):
             if not price:
                 # Try to find price in the entire container text
                 container_text = container.inner_text()
-                price_match = re.search(r'(\d+[.,]\d+|\d+)\s*€', container_text)
+                price_match = EURO_PRICE_RE.search(container_text)
                 if price_match:
                     try:
                         price = float(price_match.group(1).replace(',', '.'))
@@ -228,11 +231,13 @@ def extract_bonarea_products(page):
 def scrape_alcampo():
     print("Starting Alcampo scraper...")
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
+        # Only show the window when debugging locally
+        browser = p.chromium.launch(headless=not DEBUG_ENABLED, channel="chromium")
         page = browser.new_page(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 800}
         )
+        block_heavy_resources(page.context)
 
         try:
             print("GLOBE Visiting homepage...")
@@ -393,27 +398,14 @@ def scrape_alcampo():
             if not all_products:
                 print("ERROR: No products found from any category.")
                 # Save debug info
-                page.screenshot(path=OUTPUT_PNG, full_page=True)
-                with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
-                    f.write(page.content())
-                print(f"📸 Debug info saved to {OUTPUT_PNG} and {OUTPUT_HTML}")
+                if DEBUG_ENABLED:
+                    save_debug_screenshot(page, OUTPUT_PNG)
+                    save_debug_html(page.content(), OUTPUT_HTML)
                 return
 
             print(f"\nProcessing {len(all_products)} total products...")
-            for i, product in enumerate(all_products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "alcampo")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "alcampo", product["quantity"])
-                        print(f"SUCCESS: [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR: DB error on product {i}: {e}")
+            inserted, updated, unchanged = upsert_products(all_products, "alcampo")
+            print(f"SUCCESS: {inserted} inserted, {updated} price updates, {unchanged} unchanged")
 
         except Exception as e:
             print(f"ERROR: Scraping failed: {e}")
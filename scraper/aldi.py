@@ -1,9 +1,54 @@
 import time
 import re
 from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price
+from utils.db import insert_product, get_products_by_store, update_product_price
 from utils.logger import log_debug_message
 from utils.proxy_handler import get_browser_with_proxy
+from utils.browser import block_heavy_resources
+from utils.prices import DIGITS, price_chars
+
+EURO_PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)\s*€')
+
+# Price texts are tiny and the grammar is just digits and separators, so a
+# translate pass is cheaper than running them through the regex engine.
+# Keeps digits and '.', turns ',' into '.' and deletes everything else.
+_PRICE_CHARS = price_chars(DIGITS + ".", {",": "."})
+
+PRODUCT_PRICE_SELECTORS = ['.price', '.price__wrapper', '[class*="price"]']
+PRODUCT_DESC_SELECTORS = ['.description', '.product-description', '[class*="description"]']
+
+# Reads a product page's candidate fields in one round-trip: the text of the
+# first match of every price selector (the first one that parses wins) and the
+# first description found
+PRODUCT_DETAILS_JS = """([priceSels, descSels]) => {
+    const text = sel => {
+        const el = document.querySelector(sel);
+        return el ? el.innerText.trim() : null;
+    };
+    return {
+        prices: priceSels.map(text).filter(t => t !== null),
+        description: descSels.map(text).find(t => t !== null) ?? null,
+    };
+}"""
+
+# Price nodes in order of preference; the first selector with a match in the tile wins
+TILE_PRICE_SELECTORS = ['.price__wrapper', '.price', '[class*="price"]']
+
+# Reads every article tile in one evaluate_all. The tile text is only sent back
+# when there is no price node, for the euro-sign fallback on the main page.
+TILE_FIELDS_JS = """(els, priceSels) => els.map(el => {
+    const name = el.querySelector('.mod-article-tile__title');
+    let price = null;
+    for (const sel of priceSels) {
+        price = el.querySelector(sel);
+        if (price) break;
+    }
+    return {
+        name: name ? name.innerText.trim() : null,
+        price: price ? price.innerText.trim() : null,
+        text: price ? null : el.innerText,
+    };
+})"""
 
 def scroll_to_load_all(page, scroll_pause=3, max_scrolls=30):
     """Enhanced scrolling with better detection of new content"""
@@ -39,8 +84,7 @@ def extract_price(price_text):
     
     # Remove common price indicators and clean up
     price_text = price_text.strip()
-    price_text = re.sub(r'[^\d,.]', '', price_text)
-    price_text = price_text.replace(',', '.')
+    price_text = price_text.translate(_PRICE_CHARS)
     
     try:
         return float(price_text)
@@ -55,25 +99,18 @@ def scrape_product_page(page, product_url, product_name):
         
         # Look for additional product information
         product_info = {}
-        
+        details = page.evaluate(PRODUCT_DETAILS_JS, [PRODUCT_PRICE_SELECTORS, PRODUCT_DESC_SELECTORS])
+
         # Try to find price
-        price_selectors = ['.price', '.price__wrapper', '[class*="price"]']
-        for selector in price_selectors:
-            price_el = page.query_selector(selector)
-            if price_el:
-                price_text = price_el.inner_text().strip()
-                price = extract_price(price_text)
-                if price:
-                    product_info['price'] = price
-                    break
-        
-        # Try to find description
-        desc_selectors = ['.description', '.product-description', '[class*="description"]']
-        for selector in desc_selectors:
-            desc_el = page.query_selector(selector)
-            if desc_el:
-                product_info['description'] = desc_el.inner_text().strip()
+        for price_text in details['prices']:
+            price = extract_price(price_text)
+            if price:
+                product_info['price'] = price
                 break
+
+        # Try to find description
+        if details['description'] is not None:
+            product_info['description'] = details['description']
         
         return product_info
     except Exception as e:
@@ -85,10 +122,22 @@ def scrape_aldi():
     
     total_inserted = 0
     total_skipped = 0
+    # The same tiles repeat across the main page and the catalog pages; each
+    # product name is only processed once per run
+    seen_names = set()
+
+    # Products turn up page by page, so every existing Aldi row is loaded up front
+    # and each lookup below is a dict hit instead of a query
+    existing_by_name = get_products_by_store("aldi")
+    if existing_by_name is None:
+        # Without the lookup every product would look new and be inserted again
+        print("ERROR: Could not load existing Aldi products, aborting")
+        return
     
     with sync_playwright() as p:
         browser = get_browser_with_proxy(p)
         page = browser.new_page()
+        block_heavy_resources(page.context)
 
         try:
             # Focus on main page with enhanced scraping
@@ -119,52 +168,42 @@ def scrape_aldi():
             page.wait_for_selector('.mod-article-tile', timeout=15000)
             
             # Get all products
-            products = page.query_selector_all('.mod-article-tile')
+            products = page.locator('.mod-article-tile').evaluate_all(TILE_FIELDS_JS, TILE_PRICE_SELECTORS)
             log_debug_message(f"SEARCH Found {len(products)} products on main page.")
             print(f"SEARCH Found {len(products)} products on main page.")
+            total = len(products)
 
             category_inserted = 0
             category_skipped = 0
 
             for i, product in enumerate(products, 1):
                 try:
-                    # Extract product information
-                    name_el = product.query_selector('.mod-article-tile__title')
-                    price_el = product.query_selector('.price__wrapper')
-                    
-                    # Try alternative price selectors if main one doesn't work
-                    if not price_el:
-                        price_el = product.query_selector('.price')
-                    if not price_el:
-                        price_el = product.query_selector('[class*="price"]')
-                    
-                    # If still no price element, try to extract from entire product text
-                    if not price_el:
-                        product_text = product.inner_text()
-                        price_match = re.search(r'(\d+[.,]\d+|\d+)\s*€', product_text)
+                    # If no price element was found, try to extract from entire product text
+                    if product['price'] is None:
+                        price_match = EURO_PRICE_RE.search(product['text'])
                         if price_match:
                             price_text = price_match.group(1)
                             price = extract_price(price_text)
                         else:
                             price = None
                     else:
-                        price_text = price_el.inner_text().strip()
-                        price = extract_price(price_text)
+                        price = extract_price(product['price'])
                     
-                    if not name_el or price is None:
+                    if product['name'] is None or price is None:
                         continue
 
-                    name = name_el.inner_text().strip()
-                    if not name or len(name) < 2:
+                    name = product['name']
+                    if not name or len(name) < 2 or name in seen_names:
                         continue
+                    seen_names.add(name)
                         
                     quantity = "1 unit"  # Default quantity for Aldi products
 
                     # Progress indicator
-                    print(f"[{i}/{len(products)}] ✨ Processing: {name} - {price}€")
+                    log_debug_message(f"[{i}/{total}] ✨ Processing: {name} - {price}€")
 
                     # Check if product already exists
-                    existing_product = get_product_by_name_and_store(name, "aldi")
+                    existing_product = existing_by_name.get(name)
                     if existing_product:
                         # Update price if different
                         if existing_product['price'] != price:
@@ -174,7 +213,7 @@ def scrape_aldi():
                             except Exception as e:
                                 print(f"ERROR: Failed to update price: {str(e)}")
                         else:
-                            print(f"ℹ️ Price unchanged: {name} - {price}€")
+                            log_debug_message(f"ℹ️ Price unchanged: {name} - {price}€")
                         category_skipped += 1
                     else:
                         # Insert new product
@@ -245,34 +284,27 @@ def scrape_aldi():
                     page.wait_for_timeout(3000)
                     
                     # Look for products on this page
-                    products = page.query_selector_all('.mod-article-tile')
+                    products = page.locator('.mod-article-tile').evaluate_all(TILE_FIELDS_JS, TILE_PRICE_SELECTORS)
                     if products:
-                        print(f"✅ Found {len(products)} products on catalog page!")
+                        total = len(products)
+                        print(f"✅ Found {total} products on catalog page!")
                         
                         for i, product in enumerate(products, 1):
                             try:
-                                name_el = product.query_selector('.mod-article-tile__title')
-                                price_el = product.query_selector('.price__wrapper')
-                                
-                                if not price_el:
-                                    price_el = product.query_selector('.price')
-                                if not price_el:
-                                    price_el = product.query_selector('[class*="price"]')
-                                
-                                if not name_el or not price_el:
+                                if product['name'] is None or product['price'] is None:
                                     continue
                                 
-                                name = name_el.inner_text().strip()
-                                price_text = price_el.inner_text().strip()
-                                price = extract_price(price_text)
+                                name = product['name']
+                                price = extract_price(product['price'])
                                 
-                                if not name or price is None:
+                                if not name or price is None or name in seen_names:
                                     continue
+                                seen_names.add(name)
                                 
-                                print(f"  [{i}/{len(products)}] {name} - {price}€")
+                                log_debug_message(f"  [{i}/{total}] {name} - {price}€")
                                 
                                 # Check if product already exists
-                                existing_product = get_product_by_name_and_store(name, "aldi")
+                                existing_product = existing_by_name.get(name)
                                 if existing_product:
                                     if existing_product['price'] != price:
                                         try:
@@ -281,7 +313,7 @@ def scrape_aldi():
                                         except Exception as e:
                                             print(f"    ERROR: Failed to update price: {str(e)}")
                                     else:
-                                        print(f"    ℹ️ Price unchanged: {name} - {price}€")
+                                        log_debug_message(f"    ℹ️ Price unchanged: {name} - {price}€")
                                     total_skipped += 1
                                 else:
                                     try:
@@ -1,27 +1,24 @@
 import time
+import re
 import datetime
-from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price, supabase
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from utils.db import upsert_products, check_connection
 from utils.logger import log_debug_message as log
-import os
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot
+from utils.browser import block_heavy_resources
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 BASE_URL = "https://www.bonarea-online.com"
-
-print("Script starting...")
-
-# Test Supabase connection at startup
-print("RETRY Checking Supabase connection...")
-try:
-    test = supabase.table("products").select("count").limit(1).execute()
-    print("SUCCESS: Supabase connection successful")
-except Exception as e:
-    print(f"ERROR: Supabase connection failed: {str(e)}")
-    print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
-    exit(1)
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+# Scroll budget: a larger step halves the round trips on long grids, and the
+# loop exits early once two scrolls in a row bring no new products
+SCROLL_STEP = 1600
+MAX_SCROLLS = 30
+# Chromium profile kept between runs so cookies, consent and the HTTP cache survive
+PROFILE_DIR = "./.playwright-profile-bonarea"
 
 def scroll_to_load_all_products(page, pause_time=2, max_scrolls=20):
     last_height = 0
@@ -35,6 +32,15 @@ def scroll_to_load_all_products(page, pause_time=2, max_scrolls=20):
         last_height = new_height
         print(f"RETRY Scrolled {i+1} times")
 
+def accept_cookies(page):
+    """Accepts the cookie popup if it shows up; the consent cookie is kept in the profile."""
+    try:
+        page.click('button:has-text("Acceptar"), button:has-text("Aceptar"), button:has-text("Accept")', timeout=2000)
+        print("COOKIE Cookie popup accepted")
+        time.sleep(2)
+    except PlaywrightTimeoutError:
+        print("WARN Cookie popup not found or already accepted.")
+
 def extract_bonarea_products(page, category):
     """Extract products from BonÀrea main page"""
     try:
@@ -43,44 +49,38 @@ def extract_bonarea_products(page, category):
     except Exception as e:
         print(f"WARN Error waiting for products: {e}")
 
-    # Find all product elements
-    product_elements = page.query_selector_all('.block-product')
+    # Read name/price/weight of every card in a single call instead of
+    # several query_selector/inner_text round trips per product
+    cards = page.eval_on_selector_all('.block-product', """els => els.map(el => {
+        const text = sel => { const found = el.querySelector(sel); return found ? found.innerText.trim() : ''; };
+        return {name: text('.text p'), price: text('.price span'), quantity: text('.weight')};
+    })""")
     
-    if not product_elements:
+    if not cards:
         print("ERROR: No product elements found")
-        page.screenshot(path="bonarea_debug.png", full_page=True)
-        with open("bonarea_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("📸 Screenshot saved to bonarea_debug.png, HTML saved to bonarea_debug.html")
+        if DEBUG_ENABLED:
+            save_debug_screenshot(page, "bonarea_debug.png")
+            save_debug_html(page.content(), "bonarea_debug.html")
         return []
 
-    print(f"🔎 Found {len(product_elements)} products.")
+    print(f"🔎 Found {len(cards)} products.")
 
     results = []
-    for i, el in enumerate(product_elements, 1):
+    for i, card in enumerate(cards, 1):
         try:
-            # Extract product name
-            name_el = el.query_selector('.text p')
-            if not name_el:
-                print(f"WARN Skipped product {i}: Could not find name")
-                continue
-            name = name_el.inner_text().strip()
-            
+            name = card["name"]
             if not name:
-                print(f"WARN Skipped product {i}: Empty name")
+                print(f"WARN Skipped product {i}: Could not find name")
                 continue
 
-            # Extract price
-            price_el = el.query_selector('.price span')
-            if not price_el:
+            price_text = card["price"]
+            if not price_text:
                 print(f"WARN Skipped product {i}: Could not find price")
                 continue
                 
-            price_text = price_el.inner_text().strip()
             try:
                 # Extract numeric value from price text
-                import re
-                price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
+                price_match = PRICE_RE.search(price_text)
                 if price_match:
                     price = float(price_match.group(1).replace(',', '.'))
                 else:
@@ -90,14 +90,10 @@ def extract_bonarea_products(page, category):
                 print(f"WARN Skipped product {i}: Could not parse price")
                 continue
 
-            # Extract quantity
-            quantity_el = el.query_selector('.weight')
-            quantity = quantity_el.inner_text().strip() if quantity_el else "1 unit"
-
             results.append({
                 "name": name,
                 "price": price,
-                "quantity": quantity,
+                "quantity": card["quantity"] or "1 unit",
                 "category": category,
             })
         except Exception as e:
@@ -106,52 +102,58 @@ def extract_bonarea_products(page, category):
 
 def scrape_bonarea():
     print("Starting BonÀrea scraper...")
+    if not check_connection():
+        return
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page(
+        # Reuse cookies/localStorage/cache from the previous run when available
+        context = p.chromium.launch_persistent_context(
+            PROFILE_DIR,
+            headless=not DEBUG_ENABLED,
+            channel="chromium",
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
             viewport={"width": 1280, "height": 800}
         )
+        block_heavy_resources(context)
+        # The persistent context already opens a blank tab, use it instead of a second window
+        page = context.pages[0] if context.pages else context.new_page()
 
         try:
             print("GLOBE Visiting BonÀrea homepage...")
-            page.goto(f"{BASE_URL}/ca/shop", timeout=60000)
-            time.sleep(3)
+            page.goto(f"{BASE_URL}/ca/shop", timeout=60000, wait_until="domcontentloaded")
+            # Wait for the product grid itself instead of a fixed delay
+            try:
+                page.wait_for_selector('.block-product', timeout=8000)
+            except PlaywrightTimeoutError:
+                print("WARN Products not rendered yet, continuing...")
             print("Current URL:", page.url)
 
-            # Handle cookie popup if present
-            try:
-                cookie_button = page.query_selector('button:has-text("Acceptar")') or \
-                               page.query_selector('button:has-text("Aceptar")') or \
-                               page.query_selector('button:has-text("Accept")')
-                if cookie_button:
-                    cookie_button.click()
-                    print("COOKIE Cookie popup accepted")
-                    time.sleep(2)
-            except Exception:
-                print("WARN Cookie popup not found or already accepted.")
+            # Handle cookie popup if present. Always checked: the profile directory can
+            # exist from a run that died before consent was given, and the check only
+            # costs the short click timeout once the banner is gone.
+            accept_cookies(page)
 
             # Scroll to load more products
             print("SCROLL Scrolling to load products...")
-            for i in range(15):
-                page.mouse.wheel(0, 1000)
+            last_count = 0
+            stalled = 0
+            for i in range(MAX_SCROLLS):
+                page.mouse.wheel(0, SCROLL_STEP)
                 time.sleep(0.5)
-                
+
                 # Check if more products loaded
-                current_products = page.query_selector_all('.block-product')
+                count = page.eval_on_selector_all('.block-product', "els => els.length")
                 if i % 5 == 0:
-                    print(f"CHART Found {len(current_products)} products so far...")
+                    print(f"CHART Found {count} products so far...")
+                stalled = stalled + 1 if count == last_count else 0
+                last_count = count
+                if stalled >= 2:
+                    break
 
-            # Wait for any remaining dynamic content
-            print("WAIT Waiting for dynamic content to load...")
-            page.wait_for_timeout(5000)
-            
             # Final scroll to bottom to ensure everything is loaded
             page.mouse.wheel(0, 2000)
             time.sleep(2)
 
-            page.wait_for_timeout(3000)
-            page.screenshot(path="bonarea_debug.png", full_page=True)
+            save_debug_screenshot(page, "bonarea_debug.png")
 
             products = extract_bonarea_products(page, "general")
             if not products:
@@ -159,25 +161,14 @@ def scrape_bonarea():
                 return
 
             print(f"Processing {len(products)} products...")
-            for i, product in enumerate(products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "bonarea")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "bonarea", product["quantity"])
-                        print(f"SUCCESS: [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR: DB error on product {i}: {e}")
+            # One bulk lookup and a few bulk writes instead of two requests per product
+            inserted, updated, unchanged = upsert_products(products, "bonarea")
+            print(f"SUCCESS: {inserted} inserted, {updated} price updates, {unchanged} unchanged")
 
         except Exception as e:
             print(f"ERROR: Scraping failed: {e}")
         finally:
-            browser.close()
+            context.close()
             print("FINISH Scraper finished.")
 
 if __name__ == "__main__":
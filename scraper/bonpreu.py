@@ -1,10 +1,12 @@
-import time
+import asyncio
 import datetime
 import json
 import re
-from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price, supabase
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from utils.db import upsert_products_async, check_connection, run_async
 from utils.logger import log_debug_message as log
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot_async
+from utils.browser import block_heavy_resources_async
 import os
 from dotenv import load_dotenv
 
@@ -12,227 +14,242 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BASE_URL = "https://www.compraonline.bonpreuesclat.cat"
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+# Chromium profile kept between runs so cookies, consent and caches survive
+PROFILE_DIR = "./.playwright-profile-bonpreu"
+MAX_PARALLEL_PAGES = 3
+# Upper bound only, scrolling stops as soon as the grid stops growing
+SCROLL_STEP = 1600
+MAX_SCROLLS = 30
+PRODUCT_CARD_SEL = '[data-test="product-card"], .product-card, .product-item'
 
-print("START Bonpreu scraper starting...")
-
-# Test Supabase connection at startup
-print("RETRY Checking Supabase connection...")
-try:
-    test = supabase.table("products").select("count").limit(1).execute()
-    print("SUCCESS Supabase connection successful")
-except Exception as e:
-    print(f"ERROR Supabase connection failed: {str(e)}")
-    print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
-    exit(1)
-
-def save_debug_html(html, filename="bonpreu_debug.html"):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"SUCCESS HTML saved as {filename}")
-
-def extract_bonpreu_products(page, category):
-    """Extract products from Bonpreu main page"""
+# Category links on the homepage; only used to find the categories to scrape
+CATEGORY_LINK_SEL = 'a[href*="/categories/"]'
+# Fallback for when the homepage shows no category links
+BONPREU_CATEGORIES = [
+    {"name": "Fruita i verdura", "url": f"{BASE_URL}/categories/fruita-i-verdura"},
+    {"name": "Carn", "url": f"{BASE_URL}/categories/carn"},
+    {"name": "Peix i marisc", "url": f"{BASE_URL}/categories/peix-i-marisc"},
+    {"name": "Làctics i ous", "url": f"{BASE_URL}/categories/lactics-i-ous"},
+    {"name": "Alimentació", "url": f"{BASE_URL}/categories/alimentacio"},
+]
+
+# Collects name/price/quantity text for every product card inside the browser.
+# Card selectors are tried in order, the first one that matches anything wins.
+EXTRACT_PRODUCTS_JS = """() => {
+    const cardSelectors = ['[data-test="product-card"]', '.product-card', '[class*="product"]',
+                           '[class*="Product"]', 'article', 'div[role="article"]'];
+    // Plain tag and single-class selectors use the live getElementsBy* collections,
+    // which skip the selector parse/match pass; anything else needs querySelectorAll
+    const all = (root, sel) => {
+        if (/^[a-z][a-z0-9]*$/.test(sel)) return root.getElementsByTagName(sel);
+        if (/^\.[\w-]+$/.test(sel)) return root.getElementsByClassName(sel.slice(1));
+        return root.querySelectorAll(sel);
+    };
+    let cards = [];
+    for (const sel of cardSelectors) {
+        cards = all(document, sel);
+        if (cards.length) break;
+    }
+    const text = (el, sel) => {
+        const found = el.querySelector(sel);
+        return found ? found.innerText.trim() : '';
+    };
+    return Array.from(cards).map(el => ({
+        name: text(el, '[data-test="product-card-name"], [data-test="product-name"], .product-name, .product-title, '
+                     + 'h3, h2, a, [class*="name"], [class*="title"]'),
+        price: text(el, '[data-test="product-card-price"], [data-test="product-price"], .product-price, '
+                      + '[class*="price"], [class*="Price"], [class*="cost"]'),
+        quantity: text(el, '.product-quantity, [class*="quantity"], [class*="weight"]'),
+    }));
+}"""
+
+COOKIE_BUTTON_SEL = 'button:has-text("Acceptar"), button:has-text("Aceptar"), button:has-text("Accept"), #onetrust-accept-btn-handler'
+
+async def accept_cookies(page, cookies_accepted):
+    """Accepts the cookie popup once per run; the profile keeps the consent across runs."""
+    if cookies_accepted.is_set():
+        return
+    try:
+        # The banner is injected by the app after domcontentloaded, so wait for it
+        await page.click(COOKIE_BUTTON_SEL, timeout=5000)
+        print("COOKIE Cookie popup accepted")
+        cookies_accepted.set()
+        await asyncio.sleep(2)
+    except PlaywrightTimeoutError:
+        # Only give up for the session once the grid rendered without a banner
+        # (consent already stored in the profile); otherwise the next page retries
+        if await page.query_selector(PRODUCT_CARD_SEL) and not await page.query_selector(COOKIE_BUTTON_SEL):
+            cookies_accepted.set()
+        print("WARN Cookie popup not found or already accepted.")
+
+async def extract_bonpreu_products(page, category):
+    """Extract products from a Bonpreu listing page"""
     try:
-        # Wait for React app to load
-        page.wait_for_selector('div[data-test="product-grid"]', timeout=20000)
+        # Wait for React app to load (whichever product container shows up first)
+        await page.wait_for_selector(
+            'div[data-test="product-grid"], [data-test="product-card"], .product-card, [class*="product"]',
+            timeout=20000
+        )
     except Exception as e:
-        print(f"WARN Error waiting for product grid: {e}")
-        # Try alternative selectors
-        try:
-            page.wait_for_selector('[data-test="product-card"]', timeout=15000)
-        except Exception:
-            try:
-                page.wait_for_selector('.product-card', timeout=10000)
-            except Exception:
-                try:
-                    page.wait_for_selector('[class*="product"]', timeout=10000)
-                except Exception:
-                    print("WARN All product selectors failed")
-
-    # Find all product elements - try multiple selectors
-    product_elements = page.query_selector_all('[data-test="product-card"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('.product-card')
-    if not product_elements:
-        product_elements = page.query_selector_all('[class*="product"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('[class*="Product"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('article')
-    if not product_elements:
-        product_elements = page.query_selector_all('div[role="article"]')
+        print(f"WARN All product selectors failed: {e}")
+
+    # Read every card in one round trip instead of several CDP calls per product
+    cards = await page.evaluate(EXTRACT_PRODUCTS_JS)
     
-    if not product_elements:
-        print("ERROR No product elements found")
-        page.screenshot(path="bonpreu_debug.png", full_page=True)
-        with open("bonpreu_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("📸 Screenshot saved to bonpreu_debug.png, HTML saved to bonpreu_debug.html")
+    if not cards:
+        print(f"ERROR No product elements found in {category}")
+        if DEBUG_ENABLED:
+            await save_debug_screenshot_async(page, "bonpreu_debug.png")
+            save_debug_html(await page.content(), "bonpreu_debug.html")
         return []
 
-    print(f"🔎 Found {len(product_elements)} products.")
-
-    results = []
-    for i, el in enumerate(product_elements, 1):
-        try:
-            # Extract product name - try multiple selectors
-            name_el = el.query_selector('[data-test="product-card-name"]') or \
-                     el.query_selector('[data-test="product-name"]') or \
-                     el.query_selector('.product-name') or \
-                     el.query_selector('.product-title') or \
-                     el.query_selector('h3') or \
-                     el.query_selector('h2') or \
-                     el.query_selector('a') or \
-                     el.query_selector('[class*="name"]') or \
-                     el.query_selector('[class*="title"]')
-            
-            if not name_el:
-                print(f"WARN Skipped product {i}: Could not find name")
-                continue
-            name = name_el.inner_text().strip()
-            
-            if not name:
-                print(f"WARN Skipped product {i}: Empty name")
-                continue
-
-            # Extract price - try multiple selectors
-            price_el = el.query_selector('[data-test="product-card-price"]') or \
-                      el.query_selector('[data-test="product-price"]') or \
-                      el.query_selector('.product-price') or \
-                      el.query_selector('[class*="price"]') or \
-                      el.query_selector('span[class*="Price"]') or \
-                      el.query_selector('[class*="cost"]') or \
-                      el.query_selector('[class*="Price"]')
-            
-            if not price_el:
-                print(f"WARN Skipped product {i}: Could not find price")
-                continue
-                
-            price_text = price_el.inner_text().strip()
-            try:
-                # Extract numeric value from price text
-                import re
-                price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
-                if price_match:
-                    price = float(price_match.group(1).replace(',', '.'))
-                else:
-                    print(f"WARN Skipped product {i}: Invalid price format")
-                    continue
-            except ValueError:
-                print(f"WARN Skipped product {i}: Could not parse price")
-                continue
-
-            # Extract quantity (if available)
-            quantity_el = el.query_selector('.product-quantity') or \
-                         el.query_selector('[class*="quantity"]') or \
-                         el.query_selector('[class*="weight"]')
-            quantity = quantity_el.inner_text().strip() if quantity_el else "1 unit"
-
-            results.append({
+    # One slot per card, filled in place; skipped cards stay None. Per-card
+    # prints are replaced by a single summary line per category
+    results = [None] * len(cards)
+    for i, card in enumerate(cards):
+        name = card["name"]
+        price_match = PRICE_RE.search(card["price"]) if name else None
+        if price_match:
+            results[i] = {
                 "name": name,
-                "price": price,
-                "quantity": quantity,
+                "price": float(price_match.group(1).replace(',', '.')),
+                "quantity": card["quantity"] or "1 unit",
                 "category": category,
-            })
-        except Exception as e:
-            print(f"WARN Error processing product {i}: {e}")
+            }
+    results = [r for r in results if r]
+
+    summary = f"bonpreu [{category}]: parsed={len(results)} skipped={len(cards) - len(results)}"
+    log(summary)
+    print(f"🔎 {summary}")
     return results
 
-def scrape_bonpreu():
-    print("START Starting Bonpreu scraper...")
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800}
+async def discover_categories(page, cookies_accepted):
+    """Reads the category links from the homepage, falling back to BONPREU_CATEGORIES"""
+    try:
+        print("GLOBE Visiting Bonpreu homepage...")
+        await page.goto(BASE_URL, timeout=60000, wait_until="domcontentloaded")
+        await accept_cookies(page, cookies_accepted)
+        await page.wait_for_selector(CATEGORY_LINK_SEL, timeout=15000)
+        links = await page.eval_on_selector_all(
+            CATEGORY_LINK_SEL,
+            "els => els.map(a => ({name: a.innerText.trim(), url: a.href.split('#')[0]}))"
         )
+    except Exception as e:
+        print(f"WARN Could not read category links: {e}")
+        links = []
+
+    # The same category is often linked from the menu and the page body
+    categories = {}
+    for link in links:
+        if link["name"] and link["url"] not in categories:
+            categories[link["url"]] = link
+    if not categories:
+        print("WARN No category links found, using the fixed category list")
+        return BONPREU_CATEGORIES
+    print(f"LINK Found {len(categories)} category links")
+    return list(categories.values())
 
+async def scrape_category(context, semaphore, cookies_accepted, category, url):
+    """Scrapes one category in its own page, bounded by the shared semaphore"""
+    async with semaphore:
+        page = await context.new_page()
         try:
-            print("GLOBE Visiting Bonpreu homepage...")
-            page.goto(BASE_URL, timeout=60000)
-            time.sleep(3)
-            print("Current URL:", page.url)
+            print(f"LINK Visiting category {category}: {url}")
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            if response is None or response.status != 200:
+                status = response.status if response else "no response"
+                log(f"bonpreu [{category}]: {url} returned {status}")
+                print(f"ERROR Category {category} returned {status}: {url}")
+                return []
+            await accept_cookies(page, cookies_accepted)
 
-            # Handle cookie popup if present
-            try:
-                cookie_button = page.query_selector('button:has-text("Acceptar")') or \
-                               page.query_selector('button:has-text("Aceptar")') or \
-                               page.query_selector('button:has-text("Accept")') or \
-                               page.query_selector('#onetrust-accept-btn-handler')
-                if cookie_button:
-                    cookie_button.click()
-                    print("COOKIE Cookie popup accepted")
-                    time.sleep(2)
-            except Exception:
-                print("WARN Cookie popup not found or already accepted.")
-
-            # Try to navigate to a product category
-            try:
-                # Look for category links
-                category_links = page.query_selector_all('a[href*="/categories/"]')
-                if category_links:
-                    print("LINK Found category links, clicking first one...")
-                    category_links[0].click()
-                    time.sleep(3)
-                    print("Current URL after category click:", page.url)
-                else:
-                    print("WARN No category links found, staying on homepage")
-            except Exception as e:
-                print(f"WARN Error navigating to category: {e}")
-
-            # Scroll to load more products
-            print("SCROLL Scrolling to load products...")
-            for i in range(15):
-                page.mouse.wheel(0, 1000)
-                time.sleep(0.5)
-                
-                # Check if more products loaded
-                current_products = page.query_selector_all('[data-test="product-card"]')
-                if not current_products:
-                    current_products = page.query_selector_all('.product-card')
-                if not current_products:
-                    current_products = page.query_selector_all('.product-item')
+            # Scroll until two consecutive scrolls bring no new products, waiting
+            # for the card count to grow instead of sleeping a fixed time
+            last_count = 0
+            stalled = 0
+            for i in range(MAX_SCROLLS):
+                await page.mouse.wheel(0, SCROLL_STEP)
+                try:
+                    await page.wait_for_function(
+                        "([sel, n]) => document.querySelectorAll(sel).length > n",
+                        arg=[PRODUCT_CARD_SEL, last_count],
+                        timeout=3000
+                    )
+                except PlaywrightTimeoutError:
+                    pass
+                count = await page.eval_on_selector_all(PRODUCT_CARD_SEL, "els => els.length")
+                stalled = stalled + 1 if count == last_count else 0
+                last_count = count
                 if i % 5 == 0:
-                    print(f"CHART Found {len(current_products)} products so far...")
+                    print(f"CHART [{category}] Found {count} products so far...")
+                if stalled >= 2:
+                    break
 
-            # Wait for any remaining dynamic content
-            print("WAIT Waiting for dynamic content to load...")
-            page.wait_for_timeout(5000)
-            
-            # Final scroll to bottom to ensure everything is loaded
-            page.mouse.wheel(0, 2000)
-            time.sleep(2)
+            # Let any requests triggered by the last scroll settle
+            try:
+                await page.wait_for_load_state("networkidle", timeout=5000)
+            except PlaywrightTimeoutError:
+                pass
 
-            page.wait_for_timeout(3000)
-            page.screenshot(path="bonpreu_debug.png", full_page=True)
+            await save_debug_screenshot_async(page, "bonpreu_debug.png")
 
-            products = extract_bonpreu_products(page, "general")
+            return await extract_bonpreu_products(page, category)
+        except Exception as e:
+            print(f"ERROR Category {category} failed: {e}")
+            return []
+        finally:
+            await page.close()
+
+async def _scrape_bonpreu():
+    print("START Starting Bonpreu scraper...")
+    async with async_playwright() as p:
+        # Headful only when debugging locally, no one watches the window otherwise
+        context = await p.chromium.launch_persistent_context(
+            PROFILE_DIR,
+            headless=not DEBUG_ENABLED,
+            channel="chromium",
+            args=["--disable-blink-features=AutomationControlled", "--disable-dev-shm-usage"],
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
+            viewport={"width": 1280, "height": 800}
+        )
+        await block_heavy_resources_async(context)
+
+        try:
+            # The homepage visit handles the cookie popup, if any; category pages retry
+            # while it is unset. The flag lives for this run only, so a later run in a
+            # long-lived process checks again.
+            cookies_accepted = asyncio.Event()
+            page = context.pages[0] if context.pages else await context.new_page()
+            categories = await discover_categories(page, cookies_accepted)
+
+            semaphore = asyncio.Semaphore(MAX_PARALLEL_PAGES)
+            results = await asyncio.gather(*(
+                scrape_category(context, semaphore, cookies_accepted, cat["name"], cat["url"]) for cat in categories
+            ))
+            products = [product for result in results for product in result]
+            failed = [cat["name"] for cat, result in zip(categories, results) if not result]
+            if failed:
+                print(f"ERROR {len(failed)} of {len(categories)} categories returned no products: {', '.join(failed)}")
             if not products:
                 print("ERROR No products found.")
                 return
 
             print(f"BOX Processing {len(products)} products...")
-            for i, product in enumerate(products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "bonpreu")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "bonpreu", product["quantity"])
-                        print(f"SUCCESS [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR DB error on product {i}: {e}")
+            inserted, updated, unchanged = await upsert_products_async(products, "bonpreu")
+            print(f"SUCCESS {inserted} inserted, {updated} price updates, {unchanged} unchanged")
 
         except Exception as e:
             print(f"ERROR Scraping failed: {e}")
         finally:
-            browser.close()
+            await context.close()
             print("FINISH Scraper finished.")
 
+def scrape_bonpreu():
+    if not check_connection():
+        return
+    run_async(_scrape_bonpreu())
+
 if __name__ == "__main__":
     # Verify Playwright installation
     print("SEARCH Checking required packages...")
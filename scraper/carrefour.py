@@ -1,114 +1,222 @@
-import time
+import asyncio
 import re
-from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price, supabase
+import httpx
+from urllib.parse import urlsplit, urlunsplit, parse_qs, urlencode
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from utils.db import upsert_products_async, check_connection, run_async
 from utils.logger import log_debug_message as log
+from utils.browser import block_heavy_resources_async
+from utils.async_http_helper import DEFAULT_HEADERS
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot_async
 
 BASE_URL = "https://www.carrefour.es"
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+# Same number as PRICE_RE, but over price texts joined with \x1f: every match
+# starts at the beginning or at a separator and never crosses the next one, so
+# findall yields exactly one group per text ('' when the text has no number)
+PRICE_BLOB_RE = re.compile(r'(?:^|\x1f)[^\d\x1f]*(\d+[.,]\d+|\d+)?')
 
-print("START Carrefour scraper starting...")
+SCROLL_STEP = 1600
+MAX_SCROLLS = 30
+# Chromium profile kept between runs so the Cloudflare clearance and cookies survive
+PROFILE_DIR = "./.playwright-profile-carrefour"
+# Headless runs only get the automatic JS challenge; a debug window leaves time to solve it by hand
+CHALLENGE_TIMEOUT_MS = 120000 if DEBUG_ENABLED else 30000
+CHALLENGE_CLEARED_JS = """() => {
+    const html = document.documentElement.innerHTML.toLowerCase();
+    return !document.title.includes('Just a moment') && !html.includes('cloudflare') && !html.includes('blocked');
+}"""
 
-# Test Supabase connection at startup
-print("RETRY Checking Supabase connection...")
-try:
-    test = supabase.table("products").select("count").limit(1).execute()
-    print("SUCCESS Supabase connection successful")
-except Exception as e:
-    print(f"ERROR Supabase connection failed: {str(e)}")
-    print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
-    exit(1)
+CARREFOUR_CATEGORIES = [
+    {"name": "verduras", "url": f"{BASE_URL}/supermercado/verdura/cat20011/c"},
+]
 
-def save_debug_html(html, filename="carrefour_debug.html"):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"SUCCESS HTML saved as {filename}")
+# Selector fallbacks, most specific first. They are kept as ordered lists rather
+# than comma-joined strings because a compound selector matches in document order.
+CARD_SEL = ['.product-card', '[data-test="product-card"]', '[class*="product"]']
+NAME_SEL = ['h2', 'h3', '.product-title', '[data-test="product-title"]', '[class*="title"]']
+PRICE_SEL = ['.product-card-price__price', '[data-test="product-price"]', '.product-price', '[class*="price"]']
+QTY_SEL = ['[class*="quantity"]', '[class*="weight"]', '[class*="unit"]']
+# Any card selector is enough to know the grid has rendered
+CARD_WAIT_SEL = ", ".join(CARD_SEL)
+# Cards counted while scrolling; the loose [class*="product"] fallback would count wrappers too
+SCROLL_COUNT_SEL = '.product-card, [data-test="product-card"]'
+CLOSE_OVERLAY_SEL = 'button[aria-label*="Cerrar"], button[aria-label*="close"], button[data-test*="close"]'
 
-def extract_carrefour_products(page, category):
+# Collects name/price/quantity text for every product card inside the browser.
+# Card selectors are tried in order, the first one that matches anything wins.
+EXTRACT_PRODUCTS_JS = """([cardSelectors, nameSels, priceSels, qtySels]) => {
+    // Plain tag and single-class selectors use the live getElementsBy* collections,
+    // which skip the selector parse/match pass; anything else needs querySelectorAll
+    const all = (root, sel) => {
+        if (/^[a-z][a-z0-9]*$/.test(sel)) return root.getElementsByTagName(sel);
+        if (/^\.[\w-]+$/.test(sel)) return root.getElementsByClassName(sel.slice(1));
+        return root.querySelectorAll(sel);
+    };
+    let cards = [];
+    for (const sel of cardSelectors) {
+        cards = all(document, sel);
+        if (cards.length) break;
+    }
+    const first = (el, sels) => {
+        for (const sel of sels) {
+            const found = all(el, sel)[0];
+            if (found) return found.innerText.trim();
+        }
+        return '';
+    };
+    return Array.from(cards).map(el => ({
+        name: first(el, nameSels),
+        price: first(el, priceSels),
+        quantity: first(el, qtySels),
+    }));
+}"""
+
+# The category SPA fetches its product listing as JSON from this endpoint while
+# scrolling; when those responses are caught the DOM walk is skipped. Other XHRs
+# (recommendations, cart, banners) also carry name/price objects and are ignored.
+PRODUCT_API_MARKER = "/cloud-api/plp-food-papi/"
+API_NAME_KEYS = ("display_name", "name")
+API_PRICE_KEYS = ("active_price", "price")
+API_QTY_KEYS = ("measure_unit", "quantity")
+# Once one paginated catalog response has been seen, the remaining pages are
+# requested straight over HTTP/2 with the browser's cookies instead of scrolling
+API_OFFSET_PARAM = "offset"
+API_PAGES_PER_BATCH = 8
+MAX_API_PAGES = 40
+API_PAGE_ATTEMPTS = 2
+API_HEADERS = {**DEFAULT_HEADERS, "Accept": "application/json"}
+
+def _parse_prices(texts):
+    """Parses a batch of price texts with a single regex pass; None where there is no number"""
+    blob = "\x1f".join(text.replace("\x1f", " ") for text in texts)
+    return [float(m.replace(',', '.')) if m else None for m in PRICE_BLOB_RE.findall(blob)]
+
+def _parse_api_price(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = PRICE_RE.search(value)
+        if match:
+            return float(match.group(1).replace(',', '.'))
+    return None
+
+def _catalog_items(data):
+    """Returns the product list of a catalog response (results.items), or [] for any other shape"""
+    if not isinstance(data, dict):
+        return []
+    results = data.get("results")
+    items = results.get("items") if isinstance(results, dict) else None
+    return items if isinstance(items, list) else []
+
+def _products_from_json(data, category, found):
+    """Adds the products of a catalog response's result list to found, keyed by name"""
+    for item in _catalog_items(data):
+        if not isinstance(item, dict):
+            continue
+        name = next((item[k] for k in API_NAME_KEYS if isinstance(item.get(k), str)), None)
+        price = next((_parse_api_price(item[k]) for k in API_PRICE_KEYS if k in item), None)
+        if not name or price is None:
+            continue
+        quantity = next((item[k] for k in API_QTY_KEYS if isinstance(item.get(k), str)), None)
+        # A product listed twice (e.g. on overlapping pages) is kept once
+        found[name.strip()] = {
+            "name": name.strip(),
+            "price": price,
+            "category": category,
+            "quantity": quantity or "1 unit"
+        }
+
+def _offset_of(url):
+    return int(parse_qs(urlsplit(url).query)[API_OFFSET_PARAM][0])
+
+def _with_offset(url, offset):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query[API_OFFSET_PARAM] = [str(offset)]
+    return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+
+async def fetch_remaining_api_pages(context, api_url, page_size, category, found):
+    """Pages through the catalog API over HTTP until a page comes back empty"""
+    offset = _offset_of(api_url)
+    cookies = {c["name"]: c["value"] for c in await context.cookies()}
+    failed_pages = 0
+    # One HTTP/2 connection multiplexes every page request of the category
+    async with httpx.AsyncClient(http2=True, timeout=15, headers=API_HEADERS, cookies=cookies) as client:
+        async def fetch(url):
+            # A timeout or a 403 is often transient, so each page gets a second try
+            for attempt in range(1, API_PAGE_ATTEMPTS + 1):
+                try:
+                    response = await client.get(url)
+                    if response.status_code == 200:
+                        return response.json()
+                    log(f"❌ HTTP {response.status_code} fetching {url} (attempt {attempt})")
+                except (httpx.HTTPError, ValueError) as e:
+                    log(f"❌ Exception fetching {url} (attempt {attempt}): {e}")
+            return None
+
+        for _ in range(MAX_API_PAGES // API_PAGES_PER_BATCH):
+            urls = [_with_offset(api_url, offset + page_size * n) for n in range(1, API_PAGES_PER_BATCH + 1)]
+            offset += page_size * API_PAGES_PER_BATCH
+            exhausted = False
+            for data in await asyncio.gather(*(fetch(url) for url in urls)):
+                if data is None:
+                    # A failed page says nothing about where the catalog ends
+                    failed_pages += 1
+                    continue
+                _products_from_json(data, category, found)
+                exhausted = exhausted or not _catalog_items(data)
+            if exhausted:
+                break
+        else:
+            print(f"WARN [{category}] Stopped after {MAX_API_PAGES} catalog pages, the category may have more")
+
+    if failed_pages:
+        print(f"WARN [{category}] {failed_pages} catalog pages failed, the category is incomplete")
+
+async def extract_carrefour_products(page, category):
     """Extract products from Carrefour category page"""
     try:
-        # Wait for products to load
-        page.wait_for_selector('.product-card', timeout=15000)
+        # Wait for products to load, whichever card markup the page uses
+        await page.wait_for_selector(CARD_WAIT_SEL, timeout=15000)
     except Exception as e:
-        print(f"WARN Error waiting for products: {e}")
-        # Try alternative selectors
-        try:
-            page.wait_for_selector('[data-test="product-card"]', timeout=10000)
-        except Exception:
-            try:
-                page.wait_for_selector('[class*="product"]', timeout=10000)
-            except Exception:
-                print("WARN All product selectors failed")
-
-    # Find all product elements
-    product_elements = page.query_selector_all('.product-card')
-    if not product_elements:
-        product_elements = page.query_selector_all('[data-test="product-card"]')
-    if not product_elements:
-        product_elements = page.query_selector_all('[class*="product"]')
+        print(f"WARN All product selectors failed: {e}")
+
+    # Read every card in one round trip instead of several CDP calls per product
+    cards = await page.evaluate(EXTRACT_PRODUCTS_JS, [CARD_SEL, NAME_SEL, PRICE_SEL, QTY_SEL])
     
-    if not product_elements:
-        print("ERROR No product elements found")
-        page.screenshot(path="carrefour_debug.png", full_page=True)
-        with open("carrefour_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("📸 Screenshot saved to carrefour_debug.png, HTML saved to carrefour_debug.html")
+    if not cards:
+        print(f"ERROR No product elements found in {category}")
+        if DEBUG_ENABLED:
+            await save_debug_screenshot_async(page, "carrefour_debug.png")
+            save_debug_html(await page.content(), "carrefour_debug.html")
         return []
 
-    print(f"🔎 Found {len(product_elements)} products.")
+    print(f"🔎 Found {len(cards)} products in {category}.")
+
+    prices = _parse_prices([card["price"] for card in cards])
 
     results = []
-    for i, el in enumerate(product_elements, 1):
+    for i, (card, price) in enumerate(zip(cards, prices), 1):
         try:
-            # Extract product name
-            name_el = el.query_selector('h2') or \
-                     el.query_selector('h3') or \
-                     el.query_selector('.product-title') or \
-                     el.query_selector('[data-test="product-title"]') or \
-                     el.query_selector('[class*="title"]')
-            
-            if not name_el:
-                print(f"WARN Skipped product {i}: Could not find name")
-                continue
-            name = name_el.inner_text().strip()
-            
+            name = card["name"]
             if not name:
-                print(f"WARN Skipped product {i}: Empty name")
+                print(f"WARN Skipped product {i}: Could not find name")
                 continue
 
-            # Extract price
-            price_el = el.query_selector('.product-card-price__price') or \
-                      el.query_selector('[data-test="product-price"]') or \
-                      el.query_selector('.product-price') or \
-                      el.query_selector('[class*="price"]')
-            
-            if not price_el:
+            if not card["price"]:
                 print(f"WARN Skipped product {i}: Could not find price")
                 continue
-                
-            price_text = price_el.inner_text().strip()
-            try:
-                # Extract numeric value from price text
-                price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
-                if price_match:
-                    price = float(price_match.group(1).replace(',', '.'))
-                else:
-                    print(f"WARN Skipped product {i}: Invalid price format")
-                    continue
-            except ValueError:
+
+            if price is None:
                 print(f"WARN Skipped product {i}: Invalid price format")
                 continue
 
-            # Extract quantity (optional)
-            quantity_el = el.query_selector('[class*="quantity"]') or \
-                         el.query_selector('[class*="weight"]') or \
-                         el.query_selector('[class*="unit"]')
-            quantity = quantity_el.inner_text().strip() if quantity_el else "1 unit"
-
             results.append({
                 "name": name,
                 "price": price,
                 "category": category,
-                "quantity": quantity
+                "quantity": card["quantity"] or "1 unit"
             })
 
         except Exception as e:
@@ -117,19 +225,128 @@ def extract_carrefour_products(page, category):
 
     return results
 
-def scrape_carrefour():
+async def accept_cookies(page, cookies_done):
+    """Accepts the cookie banner once per session; later pages skip the wait entirely."""
+    if cookies_done.is_set():
+        return
+    try:
+        await page.click('button:has-text("Aceptar"), button:has-text("Accept"), button[data-test*="accept"]', timeout=800)
+        print("COOKIE Cookie popup accepted")
+        cookies_done.set()
+    except PlaywrightTimeoutError:
+        print("WARN Cookie popup not found or already accepted.")
+
+async def save_products(products):
+    """Inserts new products and updates changed prices"""
+    print(f"BOX Processing {len(products)} products...")
+    inserted, updated, unchanged = await upsert_products_async(products, "carrefour")
+    print(f"SUCCESS {inserted} inserted, {updated} price updates, {unchanged} unchanged")
+
+async def scrape_category(context, url, name, cookies_done):
+    """Scrapes one category in a fresh page of the shared context and returns its products"""
+    page = await context.new_page()
+    try:
+        # Keyed by name, so each product is saved once per category
+        api_products = {}
+        # (url, product count) of catalog responses that carry an offset parameter
+        paged_responses = []
+
+        async def on_response(response):
+            if PRODUCT_API_MARKER not in response.url:
+                return
+            if "json" not in response.headers.get("content-type", ""):
+                return
+            try:
+                data = await response.json()
+            except Exception:
+                return
+            before = len(api_products)
+            _products_from_json(data, name, api_products)
+            added = len(api_products) - before
+            if added and API_OFFSET_PARAM in parse_qs(urlsplit(response.url).query):
+                paged_responses.append((response.url, added))
+
+        page.on("response", on_response)
+
+        print(f"LINK Navigating to {name} category...")
+        await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        print("Current URL after category navigation:", page.url)
+        await accept_cookies(page, cookies_done)
+
+        # Handle any overlays or popups
+        try:
+            close_button = await page.query_selector(CLOSE_OVERLAY_SEL)
+            if close_button:
+                await close_button.click()
+                print("STORE Overlay closed")
+        except Exception:
+            print("WARN No overlay found.")
+
+        # Scroll until two consecutive scrolls bring no new products, waiting
+        # for the card count to grow instead of sleeping a fixed time
+        print(f"SCROLL [{name}] Scrolling to load products...")
+        prev = 0
+        stable = 0
+        for i in range(MAX_SCROLLS):
+            await page.mouse.wheel(0, SCROLL_STEP)
+            try:
+                await page.wait_for_function(
+                    "([sel, n]) => document.querySelectorAll(sel).length > n",
+                    arg=[SCROLL_COUNT_SEL, prev],
+                    timeout=2000
+                )
+            except PlaywrightTimeoutError:
+                pass
+            count = await page.eval_on_selector_all(SCROLL_COUNT_SEL, "els => els.length")
+            if i % 5 == 0:
+                print(f"CHART [{name}] Found {count} products so far...")
+            stable = stable + 1 if count == prev else 0
+            prev = count
+            # A paginated catalog call is all fetch_remaining_api_pages needs
+            if stable >= 2 or paged_responses:
+                break
+
+        # Let any requests triggered by the last scroll settle
+        try:
+            await page.wait_for_load_state("networkidle", timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
+
+        await save_debug_screenshot_async(page, "carrefour_debug.png")
+
+        if paged_responses:
+            # Responses can land out of order; continue after the furthest page seen
+            last_url, page_size = max(paged_responses, key=lambda r: _offset_of(r[0]))
+            await fetch_remaining_api_pages(context, last_url, page_size, name, api_products)
+
+        if api_products:
+            print(f"BOX [{name}] Read {len(api_products)} products from the catalog API")
+            products = list(api_products.values())
+        else:
+            products = await extract_carrefour_products(page, name)
+        if not products:
+            print(f"ERROR No products found in {name}.")
+            return []
+
+        return products
+    finally:
+        await page.close()
+
+async def _scrape_carrefour():
     print("START Starting Carrefour scraper...")
-    with sync_playwright() as p:
-        # Use more stealthy browser settings
-        browser = p.chromium.launch(
-            headless=False,
+    async with async_playwright() as p:
+        # Use more stealthy browser settings; headful only when debugging locally.
+        # No GPU/compositor flags: headless Chromium runs without a GPU process anyway
+        context = await p.chromium.launch_persistent_context(
+            PROFILE_DIR,
+            headless=not DEBUG_ENABLED,
+            channel="chromium",
             args=[
                 '--disable-blink-features=AutomationControlled',
                 '--disable-dev-shm-usage',
                 '--no-sandbox',
                 '--disable-setuid-sandbox',
                 '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
                 '--disable-extensions',
                 '--disable-plugins',
                 '--disable-background-timer-throttling',
@@ -145,8 +362,6 @@ def scrape_carrefour():
                 '--hide-scrollbars',
                 '--mute-audio',
                 '--no-zygote',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
                 '--disable-background-networking',
                 '--disable-sync-preferences',
                 '--disable-background-downloads',
@@ -154,11 +369,8 @@ def scrape_carrefour():
                 '--disable-component-update',
                 '--disable-domain-reliability',
                 '--disable-features=TranslateUI'
-            ]
-        )
-        
-        # Create context with more stealthy settings
-        context = browser.new_context(
+            ],
+            # More stealthy context settings
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
             locale="es-ES",
@@ -180,8 +392,10 @@ def scrape_carrefour():
             }
         )
         
+        await block_heavy_resources_async(context)
+
         # Add comprehensive stealth scripts
-        context.add_init_script("""
+        await context.add_init_script("""
             // Override the 'webdriver' property
             Object.defineProperty(navigator, 'webdriver', {
                 get: () => undefined,
@@ -249,118 +463,60 @@ def scrape_carrefour():
             });
         """)
         
-        page = context.new_page()
+        page = await context.new_page()
 
         try:
             print("GLOBE Visiting Carrefour homepage...")
             
             # First visit the main homepage to establish a session
-            page.goto(f"{BASE_URL}", timeout=60000)
-            time.sleep(3)
+            await page.goto(f"{BASE_URL}", timeout=60000)
+            await asyncio.sleep(3)
             print("Current URL after homepage:", page.url)
 
             # Check if we hit the Cloudflare page
-            page_content = page.content().lower()
+            page_content = (await page.content()).lower()
             if "cloudflare" in page_content or "blocked" in page_content:
-                print("WARN Hit Cloudflare security check, waiting for manual verification...")
-                print("Please manually complete the security check in the browser window")
-                print("Then press Enter to continue...")
-                input()
-                time.sleep(3)
-                
-                # Check if we're still on the security page
-                if "cloudflare" in page.content().lower() or "blocked" in page.content().lower():
-                    print("ERROR Still on security page after manual verification")
+                print("WARN Hit Cloudflare security check, waiting for it to clear...")
+                if DEBUG_ENABLED:
+                    print("Please manually complete the security check in the browser window")
+                try:
+                    await page.wait_for_function(CHALLENGE_CLEARED_JS, timeout=CHALLENGE_TIMEOUT_MS, polling=1000)
+                except PlaywrightTimeoutError:
+                    print("ERROR Still on security page, rerun with SCRAPER_DEBUG=1 to complete it manually")
                     return
+                # The clearance cookie lands in the persistent profile, so the next run skips the check
+                print("SUCCESS Security check passed")
 
-            # Handle cookie popup if present
-            try:
-                cookie_button = page.query_selector('button:has-text("Aceptar")') or \
-                               page.query_selector('button:has-text("Accept")') or \
-                               page.query_selector('button[data-test*="accept"]')
-                if cookie_button:
-                    cookie_button.click()
-                    print("COOKIE Cookie popup accepted")
-                    time.sleep(2)
-            except Exception:
-                print("WARN Cookie popup not found or already accepted.")
-
-            # Try to navigate to a different category
-            print("LINK Navigating to vegetables category...")
-            page.goto(f"{BASE_URL}/supermercado/verdura/cat20011/c", timeout=60000)
-            time.sleep(3)
-            print("Current URL after category navigation:", page.url)
+            # Handle cookie popup if present; the consent cookie then covers every category page
+            cookies_done = asyncio.Event()
+            await accept_cookies(page, cookies_done)
 
-            # Handle any overlays or popups
-            try:
-                close_button = page.query_selector('button[aria-label*="Cerrar"]') or \
-                              page.query_selector('button[aria-label*="close"]') or \
-                              page.query_selector('button[data-test*="close"]')
-                if close_button:
-                    close_button.click()
-                    print("STORE Overlay closed")
-                    time.sleep(2)
-            except Exception:
-                print("WARN No overlay found.")
-
-            # Scroll to load more products
-            print("SCROLL Scrolling to load products...")
-            for i in range(15):
-                page.mouse.wheel(0, 1000)
-                time.sleep(0.5)
-                
-                # Check if more products loaded
-                current_products = page.query_selector_all('.product-card')
-                if not current_products:
-                    current_products = page.query_selector_all('[data-test="product-card"]')
-                if not current_products:
-                    current_products = page.query_selector_all('[class*="product"]')
-                if i % 5 == 0:
-                    print(f"CHART Found {len(current_products)} products so far...")
-
-            # Wait for any remaining dynamic content
-            print("WAIT Waiting for dynamic content to load...")
-            page.wait_for_timeout(5000)
-            
-            # Final scroll to bottom to ensure everything is loaded
-            page.mouse.wheel(0, 2000)
-            time.sleep(2)
+            await page.close()
 
-            page.wait_for_timeout(3000)
-            
-            # Try to take screenshot, but don't fail if it doesn't work
-            try:
-                page.screenshot(path="carrefour_debug.png", full_page=True)
-            except Exception as e:
-                print(f"WARN Screenshot failed: {e}")
-
-            products = extract_carrefour_products(page, "verduras")
+            # Every category gets a fresh page, the session cookies live in the context
+            products = []
+            for cat in CARREFOUR_CATEGORIES:
+                try:
+                    products.extend(await scrape_category(context, cat["url"], cat["name"], cookies_done))
+                except Exception as e:
+                    print(f"ERROR Category {cat['name']} failed: {e}")
             if not products:
                 print("ERROR No products found.")
                 return
 
-            print(f"BOX Processing {len(products)} products...")
-            for i, product in enumerate(products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "carrefour")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "carrefour", product["quantity"])
-                        print(f"SUCCESS [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR DB error on product {i}: {e}")
+            await save_products(products)
 
         except Exception as e:
             print(f"ERROR Scraping failed: {e}")
         finally:
-            browser.close()
+            await context.close()
             print("FINISH Scraper finished.")
 
+def scrape_carrefour():
+    if not check_connection():
+        return
+    run_async(_scrape_carrefour())
+
 if __name__ == "__main__":
     # Verify Playwright installation
     print("SEARCH Checking required packages...")
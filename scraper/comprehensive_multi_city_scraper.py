@@ -4,14 +4,18 @@ Comprehensive Multi-City Multi-Market Scraper
 Scrapes products from all available markets across different Spanish cities
 """
 
-import time
-import random
+import asyncio
+import heapq
+import inspect
 import json
-from datetime import datetime
+import random
+import threading
+import time
+from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
 # Import all available scrapers
-from utils.db import get_city_stats
+from utils.db import get_city_stats, get_city_stats_since
 from utils.logger import log_debug_message as log
 
 def load_cities():
@@ -132,6 +136,55 @@ MARKET_CONFIGS = {
     }
 }
 
+# Default targets: the largest cities above this population
+MAJOR_CITY_POPULATION = 200000
+MAX_DEFAULT_CITIES = 8
+
+# Markets hit different domains, so they run side by side; the cap keeps the
+# number of simultaneous Chromium instances (and memory) bounded
+MAX_CONCURRENT_MARKETS = 4
+
+# (scraper function, accepts max_products) per market, resolved on first use;
+# None marks a market whose scraper could not be imported
+_RESOLVED = {}
+
+# Scheduled per-market jobs and the weekly comprehensive run can overlap. A second
+# run of the same market would find its persistent Chromium profile locked, so
+# each market scrapes one run at a time and a late arrival waits its turn.
+_MARKET_LOCKS = {market_name: threading.Lock() for market_name in MARKET_CONFIGS}
+
+# When each market's last scrape finished (time.monotonic). Different markets run
+# side by side, but back-to-back runs against the same host are still spaced by
+# the market's configured delay.
+_LAST_FINISHED = {}
+
+def _wait_for_host(market_name: str):
+    """Sleeps until the market's politeness delay since its previous run has passed"""
+    last = _LAST_FINISHED.get(market_name)
+    if last is None:
+        return
+    config = MARKET_CONFIGS[market_name]
+    delay_min, delay_max = config.get('delay_between_runs') or config.get('delay_between_cities')
+    wait = random.uniform(delay_min, delay_max) - (time.monotonic() - last)
+    if wait > 0:
+        print(f"⏳ Waiting {wait:.1f}s before hitting {market_name} again...")
+        time.sleep(wait)
+
+def _load_scraper(market_name: str):
+    """Imports a market's scraper and inspects its signature once"""
+    if market_name not in _RESOLVED:
+        config = MARKET_CONFIGS[market_name]
+        try:
+            module = __import__(config['scraper_module'], fromlist=[config['scraper_function']])
+            scraper_function = getattr(module, config['scraper_function'])
+        except Exception as e:
+            print(f"⚠️ Disabling {market_name}, scraper unavailable: {e}")
+            _RESOLVED[market_name] = None
+        else:
+            accepts_max_products = 'max_products' in inspect.signature(scraper_function).parameters
+            _RESOLVED[market_name] = (scraper_function, accepts_max_products)
+    return _RESOLVED[market_name]
+
 def run_market_scraper(market_name: str, cities: Optional[List[str]] = None, max_products: Optional[int] = None):
     """
     Run a specific market scraper
@@ -146,22 +199,28 @@ def run_market_scraper(market_name: str, cities: Optional[List[str]] = None, max
         print(f"❌ Unknown market: {market_name}")
         return 0
     
+    resolved = _load_scraper(market_name)
+    if resolved is None:
+        return 0
+    scraper_function, accepts_max_products = resolved
+
+    lock = _MARKET_LOCKS[market_name]
+    if not lock.acquire(blocking=False):
+        print(f"⏳ {market_name} is already running, waiting for it to finish...")
+        lock.acquire()
+    # Under the lock, so two queued runs of a market can't both skip the wait
+    _wait_for_host(market_name)
+
     print(f"\n🏪 Starting {market_name} scraper...")
     
     try:
-        # Import the scraper module
-        module = __import__(config['scraper_module'], fromlist=[config['scraper_function']])
-        scraper_function = getattr(module, config['scraper_function'])
-        
         if config['city_support'] and cities:
             # Multi-city scraper
             max_per_city = max_products or config['max_products_per_city']
             return scraper_function(cities=cities, max_products_per_city=max_per_city)
         else:
             # Single location scraper - check if it accepts parameters
-            import inspect
-            sig = inspect.signature(scraper_function)
-            if 'max_products' in sig.parameters:
+            if accepts_max_products:
                 max_prod = max_products or config['max_products']
                 return scraper_function(max_products=max_prod)
             else:
@@ -171,6 +230,34 @@ def run_market_scraper(market_name: str, cities: Optional[List[str]] = None, max
     except Exception as e:
         print(f"❌ Error running {market_name}: {e}")
         return 0
+    finally:
+        _LAST_FINISHED[market_name] = time.monotonic()
+        lock.release()
+
+async def run_market_scraper_async(market_name: str, cities: Optional[List[str]] = None, max_products: Optional[int] = None):
+    """Runs a market scraper in a worker thread so several markets can run at once"""
+    if market_name in MARKET_CONFIGS:
+        # Import on the event loop thread; concurrent imports from workers can deadlock
+        _load_scraper(market_name)
+    return await asyncio.to_thread(run_market_scraper, market_name, cities, max_products)
+
+async def _run_markets(jobs):
+    """Runs (market, cities, max_products) jobs concurrently, returns product counts in job order"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_MARKETS)
+
+    async def run(market, cities, max_products):
+        async with semaphore:
+            return await run_market_scraper_async(market, cities, max_products)
+
+    results = await asyncio.gather(*(run(*job) for job in jobs), return_exceptions=True)
+    counts = []
+    for (market, _, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"❌ Error running {market}: {result}")
+            result = 0
+        print(f"✅ {market}: {result} products")
+        counts.append(result or 0)
+    return counts
 
 def scrape_comprehensive_multi_city(
     cities: Optional[List[str]] = None,
@@ -198,9 +285,9 @@ def scrape_comprehensive_multi_city(
     
     # Determine cities to scrape
     if cities is None:
-        # Major cities (population > 200k)
-        major_cities = [city['name'] for city in cities_data if city['population'] > 200000]
-        target_cities = major_cities[:8]  # Top 8 major cities
+        # Top 8 major cities (population > 200k), largest first
+        largest = heapq.nlargest(MAX_DEFAULT_CITIES, cities_data, key=lambda city: city['population'])
+        target_cities = [city['name'] for city in largest if city['population'] > MAJOR_CITY_POPULATION]
     else:
         target_cities = cities
     
@@ -223,6 +310,9 @@ def scrape_comprehensive_multi_city(
             print(f"  {city}: {count} products")
     else:
         print("  No city statistics available")
+    # Products created from here on are counted on top of the initial stats,
+    # so the final report doesn't need another full scan
+    stats_since = datetime.now(timezone.utc).isoformat()
     
     total_products = 0
     start_time = datetime.now()
@@ -234,39 +324,13 @@ def scrape_comprehensive_multi_city(
     print(f"\n🏙️ City-supporting markets: {', '.join(city_markets)}")
     print(f"🏪 Single-location markets: {', '.join(single_markets)}")
     
-    # Run city-supporting markets
-    for market in city_markets:
-        print(f"\n{'='*50}")
-        print(f"🏪 Running {market.upper()} for all cities...")
-        
-        products = run_market_scraper(market, target_cities, max_products_per_city)
-        total_products += products or 0
-        
-        print(f"✅ {market}: {products} total products")
-        
-        # Delay between city-supporting markets
-        if market != city_markets[-1]:
-            delay = random.uniform(30, 60)
-            print(f"⏳ Waiting {delay:.1f}s before next city-supporting market...")
-            time.sleep(delay)
-    
-    # Run single-location markets
-    for market in single_markets:
-        print(f"\n{'='*50}")
-        print(f"🏪 Running {market.upper()} (single location)...")
-        
-        products = run_market_scraper(market, None, max_products_per_market)
-        total_products += products or 0
-        
-        print(f"✅ {market}: {products} products")
-        
-        # Delay between single-location markets
-        if market != single_markets[-1]:
-            config = MARKET_CONFIGS[market]
-            delay_min, delay_max = config['delay_between_runs']
-            delay = random.uniform(delay_min, delay_max)
-            print(f"⏳ Waiting {delay:.1f}s before next market...")
-            time.sleep(delay)
+    # Every market talks to its own domain, so they run concurrently instead of
+    # one after another with long pauses in between
+    jobs = [(market, target_cities, max_products_per_city) for market in city_markets]
+    jobs += [(market, None, max_products_per_market) for market in single_markets]
+    print(f"\n{'='*50}")
+    print(f"🏪 Running {len(jobs)} markets, up to {MAX_CONCURRENT_MARKETS} at a time...")
+    total_products += sum(asyncio.run(_run_markets(jobs)))
     
     # Final statistics
     end_time = datetime.now()
@@ -281,7 +345,9 @@ def scrape_comprehensive_multi_city(
     
     # Show final city stats
     print(f"\n📊 Final city statistics:")
-    final_stats = get_city_stats()
+    final_stats = get_city_stats_since(stats_since, initial_stats) if initial_stats else None
+    if final_stats is None:
+        final_stats = get_city_stats()
     if final_stats:
         # Filter out None keys and sort
         filtered_final_stats = {k: v for k, v in final_stats.items() if k is not None}
@@ -304,27 +370,11 @@ def scrape_specific_city_markets(city: str, markets: List[str], max_products: in
     city_markets = [m for m in markets if MARKET_CONFIGS[m]['city_support']]
     single_markets = [m for m in markets if not MARKET_CONFIGS[m]['city_support']]
     
-    total_products = 0
-    
-    # Run city-supporting markets for this specific city
-    for market in city_markets:
-        print(f"\n🏪 Running {market} for {city}...")
-        products = run_market_scraper(market, [city], max_products)
-        total_products += products or 0
-        print(f"✅ {market} for {city}: {products} products")
-        
-        if market != city_markets[-1]:
-            time.sleep(random.uniform(10, 20))
-    
-    # Run single-location markets (they don't support cities)
-    for market in single_markets:
-        print(f"\n🏪 Running {market} (single location)...")
-        products = run_market_scraper(market, None, max_products)
-        total_products += products or 0
-        print(f"✅ {market}: {products} products")
-        
-        if market != single_markets[-1]:
-            time.sleep(random.uniform(15, 25))
+    # Same concurrent runner as the comprehensive scrape, so no blocking
+    # politeness sleeps between markets that live on different domains
+    jobs = [(market, [city], max_products) for market in city_markets]
+    jobs += [(market, None, max_products) for market in single_markets]
+    total_products = sum(asyncio.run(_run_markets(jobs)))
     
     print(f"\n🎉 {city} scraping complete! Total: {total_products} products")
 
@@ -1,10 +1,16 @@
-import time
+import asyncio
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price
+from utils.db import upsert_products
 from utils.logger import log_debug_message as log
+from utils.async_http_helper import fetch_all_parallel
+from utils.debug import DEBUG_ENABLED, save_debug_html
+from utils.browser import block_heavy_resources
+from utils.prices import DIGITS, price_chars
 
 BASE_URL = "https://www.condisline.com"
 
@@ -19,98 +25,158 @@ ALIMENTACION_CATEGORIES = [
 
 HEADLESS = True
 
+# Result header above the listing, e.g. "48 artículos". The server only renders the
+# first batch when a category lazy-loads the rest on scroll, so a static list is only
+# trusted when it holds as many items as the header announces.
+TOTAL_COUNT_RE = re.compile(r'(\d+)\s*(?:artículos|productos|resultados)', re.IGNORECASE)
+
+
+# Thousands dots are dropped and the decimal comma becomes a dot in the same pass
+_PRICE_CHARS = price_chars(DIGITS, {".": None, ",": "."})
+
 
 def normalize_price(text: str) -> float:
     # Remove currency symbols and normalize decimal comma to dot
-    cleaned = re.sub(r"[^0-9,\\.]", "", text)
-    cleaned = cleaned.replace('.', '').replace(',', '.')
+    cleaned = text.translate(_PRICE_CHARS)
     try:
         return float(cleaned)
     except ValueError:
         return 0.0
 
 
-def scrape_category(category_name, category_url):
-    log(f"🌐 Visiting category: {category_name} → {category_url}")
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        page = browser.new_page()
+def complete_static_items(category_name, fetched):
+    """Returns the product items of a fetched category page, or [] when it needs the browser."""
+    if fetched["status"] != 200:
+        return []
+    html = fetched["html"]
+    items = HTMLParser(html).css('ul.articles_list li.article')
+    if not items:
+        return []
+    listing_start = html.find('articles_list')
+    total_match = TOTAL_COUNT_RE.search(html, 0, listing_start if listing_start != -1 else len(html))
+    if not total_match:
+        log(f"WARN No result count on '{category_name}', can't tell if the static list is complete")
+        return []
+    total = int(total_match.group(1))
+    if len(items) < total:
+        log(f"WARN Only {len(items)} of {total} products in the static '{category_name}' page")
+        return []
+    return items
+
+
+def save_category_items(category_name, items):
+    """Parses product list items and saves them to the database."""
+    products = []
+    for item in items:
         try:
-            page.goto(category_url, timeout=60000, wait_until='domcontentloaded')
-            # scroll to bottom to load lazy content
-            prev = None
-            while True:
-                page.keyboard.press('End')
-                time.sleep(1)
-                curr = page.evaluate('document.body.scrollHeight')
-                if curr == prev:
-                    break
-                prev = curr
-
-            html = page.content()
-            # save debug
-            fn = f"condisline_{category_name.replace(' ', '_')}_debug.html"
-            with open(fn, 'w', encoding='utf-8') as f:
-                f.write(html)
-            log(f"💾 HTML saved as {fn}")
-
-            soup = BeautifulSoup(html, 'html.parser')
-            # new selector: list items in carousel
-            items = soup.select('ul.articles_list li.article')
-            log(f"🔎 Found {len(items)} products in '{category_name}'")
-
-            for item in items:
-                try:
-                    # Name and link
-                    title_el = item.select_one('a.article_name span[itemprop="name"]')
-                    name = title_el.text.strip() if title_el else ''
-                    # Brand optional
-                    brand_el = item.select_one('span[itemprop="brand"]')
-                    brand = brand_el.text.strip() if brand_el else ''
-                    # Price
-                    price_el = item.select_one('div.article_price_container span.article_price')
-                    price = normalize_price(price_el.text) if price_el else 0.0
-                    # Unit price / PUM
-                    pum_el = item.select_one('div.article_pum span')
-                    quantity = pum_el.text.strip() if pum_el else ''
-
-                    full_name = f"{brand} {name}".strip()
-                    
-                    # Check if product exists
-                    existing_product = get_product_by_name_and_store(full_name, "condisline")
-                    
-                    if existing_product:
-                        # Product exists, check for price change
-                        if existing_product['price'] != price:
-                            log(f"RETRY Price changed for {full_name}: {existing_product['price']} -> {price}")
-                            print(f"RETRY Price changed for {full_name}: {existing_product['price']} -> {price}")
-                            update_product_price(existing_product['id'], price)
-                        else:
-                            log(f"No changes for {full_name}")
-                            print(f"No changes for {full_name}")
-                    else:
-                        # Product doesn't exist, insert it
-                        insert_product(
-                            name=full_name,
-                            price=price,
-                            category=category_name,
-                            store_id="condisline",
-                            quantity=quantity
-                        )
-                        log(f"SUCCESS Inserted: {full_name} — {price} [ {quantity} ]")
-                        print(f"SUCCESS Inserted: {full_name} — {price} [ {quantity} ]")
-                except Exception as e:
-                    log(f"ERROR Failed to parse or insert product: {e}")
+            # Name and link
+            title_el = item.css_first('a.article_name span[itemprop="name"]')
+            name = title_el.text().strip() if title_el else ''
+            # Brand optional
+            brand_el = item.css_first('span[itemprop="brand"]')
+            brand = brand_el.text().strip() if brand_el else ''
+            # Price
+            price_el = item.css_first('div.article_price_container span.article_price')
+            price = normalize_price(price_el.text()) if price_el else 0.0
+            # Unit price / PUM
+            pum_el = item.css_first('div.article_pum span')
+            quantity = pum_el.text().strip() if pum_el else ''
+
+            products.append({
+                "name": f"{brand} {name}".strip(),
+                "price": price,
+                "category": category_name,
+                "quantity": quantity
+            })
         except Exception as e:
-            log(f"ERROR Error loading or parsing page '{category_name}': {e}")
-        finally:
-            browser.close()
+            log(f"ERROR Failed to parse product: {e}")
+
+    if not products:
+        return
+    # One summary line per category instead of a log + print per product
+    inserted, updated, unchanged = upsert_products(products, "condisline")
+    summary = f"SUCCESS {category_name}: {inserted} inserted, {updated} price updates, {unchanged} unchanged"
+    log(summary)
+    print(summary)
+
+
+def scrape_category(browser, category_name, category_url):
+    """Renders one category in a browser and returns its product list items."""
+    log(f"🌐 Visiting category: {category_name} → {category_url}")
+    # A fresh context per category keeps cookies apart without relaunching Chromium
+    context = browser.new_context()
+    block_heavy_resources(context)
+    page = context.new_page()
+    try:
+        page.goto(category_url, timeout=60000, wait_until='domcontentloaded')
+        # scroll to bottom to load lazy content
+        prev = None
+        while True:
+            page.keyboard.press('End')
+            time.sleep(1)
+            curr = page.evaluate('document.body.scrollHeight')
+            if curr == prev:
+                break
+            prev = curr
+
+        # save debug
+        if DEBUG_ENABLED:
+            save_debug_html(page.content(), f"condisline_{category_name.replace(' ', '_')}_debug.html")
+
+        # Only the product list is needed, so serialize just that fragment
+        # in the browser instead of parsing the whole document
+        listing_html = page.eval_on_selector_all(
+            'ul.articles_list', 'els => els.map(el => el.outerHTML).join("")'
+        )
+        tree = HTMLParser(listing_html)
+        # new selector: list items in carousel
+        items = tree.css('ul.articles_list li.article')
+        log(f"🔎 Found {len(items)} products in '{category_name}'")
+        return items
+    except Exception as e:
+        log(f"ERROR Error loading or parsing page '{category_name}': {e}")
+        return []
+    finally:
+        context.close()
 
 
 def main():
     log("START Starting Condisline scraper")
-    for name, url in ALIMENTACION_CATEGORIES:
-        scrape_category(name, url)
+    # Fetch every category page over plain HTTP in parallel first; only the
+    # pages without a complete server-rendered product list need a browser
+    pages = asyncio.run(fetch_all_parallel([url for _, url in ALIMENTACION_CATEGORIES]))
+    # Saves run on a single writer thread in submission order, so the browser
+    # goes on to the next category while the previous upsert is in flight
+    saves = []
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending = []
+        for (name, url), fetched in zip(ALIMENTACION_CATEGORIES, pages):
+            items = complete_static_items(name, fetched)
+            if items:
+                log(f"🔎 Found {len(items)} products in '{name}' (HTTP)")
+                saves.append((name, writer.submit(save_category_items, name, items)))
+            else:
+                pending.append((name, url))
+
+        if pending:
+            # One Chromium launch serves every category that needs a browser
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=HEADLESS)
+                try:
+                    for name, url in pending:
+                        items = scrape_category(browser, name, url)
+                        if items:
+                            saves.append((name, writer.submit(save_category_items, name, items)))
+                finally:
+                    browser.close()
+
+    # A failed upsert is raised from its future; surface it instead of ending quietly
+    for name, save in saves:
+        try:
+            save.result()
+        except Exception as e:
+            log(f"ERROR Failed to save '{name}': {e}")
+            print(f"ERROR Failed to save '{name}': {e}")
 
 if __name__ == '__main__':
     main()
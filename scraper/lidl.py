@@ -1,97 +1,273 @@
-import time
+import asyncio
 import datetime
 import json
 import re
-from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price, supabase
+from selectolax.parser import HTMLParser
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from utils.db import upsert_products, check_connection
 from utils.logger import log_debug_message as log
-import os
+from utils.debug import DEBUG_ENABLED, save_debug_html, save_debug_screenshot_async
+from utils.browser import block_heavy_resources_async
+from utils.async_http_helper import fetch_all_parallel
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 BASE_URL = "https://www.lidl.es"
+# Chromium profile kept between runs, so the consent and security-check cookies and
+# site storage survive
+PROFILE_DIR = "./.playwright-profile-lidl"
+# Category grids tried over plain HTTP/2 before a browser is started
+LIDL_CATEGORIES = [
+    ("alimentos", f"{BASE_URL}/es/c/comprar-alimentos/c1856"),
+]
+# Bounded wait for the security page to go away; only a debug window can be solved by hand
+CHALLENGE_TIMEOUT_MS = 120000 if DEBUG_ENABLED else 30000
+# Runs in the page, so neither the first check nor the polling ships the DOM over CDP.
+# The block pages are tiny, so their markers show up within the first 4KB of markup.
+CHALLENGE_CLEARED_JS = """() => !/security/i.test(location.href)
+    && !/myra|captcha/i.test(document.documentElement.innerHTML.slice(0, 4096))"""
+# Chromium flags for the stealthier launch. dict.fromkeys keeps the order and
+# drops any flag that gets listed twice when this is edited again.
+LAUNCH_ARGS = tuple(dict.fromkeys([
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-extensions',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-field-trial-config',
+    '--disable-ipc-flooding-protection',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--hide-scrollbars',
+    '--mute-audio',
+    '--no-zygote',
+    '--disable-background-networking',
+    '--disable-client-side-phishing-detection',
+    '--disable-component-update',
+    '--disable-domain-reliability',
+    '--disable-features=TranslateUI',
+    '--disable-hang-monitor',
+    '--disable-prompt-on-repost',
+]))
 
-print("Starting Lidl scraper...")
+# Masks the usual headless/automation fingerprints before any page script runs
+STEALTH_INIT_JS = """
+// Override the 'webdriver' property
+Object.defineProperty(navigator, 'webdriver', {
+    get: () => undefined,
+});
 
-# Test Supabase connection at startup
-print("RETRY Checking Supabase connection...")
-try:
-    test = supabase.table("products").select("count").limit(1).execute()
-    print("SUCCESS: Supabase connection successful")
-except Exception as e:
-    print(f"ERROR: Supabase connection failed: {str(e)}")
-    print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
-    exit(1)
+// Override the 'plugins' property
+Object.defineProperty(navigator, 'plugins', {
+    get: () => [1, 2, 3, 4, 5],
+});
 
-def save_debug_html(html, filename="lidl_debug.html"):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"SUCCESS: HTML saved as {filename}")
+// Override the 'languages' property
+Object.defineProperty(navigator, 'languages', {
+    get: () => ['es-ES', 'es', 'en'],
+});
 
-def extract_lidl_products(page, category):
+// Override the 'permissions' property
+const originalQuery = window.navigator.permissions.query;
+window.navigator.permissions.query = (parameters) => (
+    parameters.name === 'notifications' ?
+        Promise.resolve({ state: Notification.permission }) :
+        originalQuery(parameters)
+);
+
+// Override the 'chrome' property
+Object.defineProperty(window, 'chrome', {
+    writable: true,
+    enumerable: true,
+    configurable: true,
+    value: {
+        runtime: {},
+    },
+});
+
+// Override the 'outerHeight' and 'outerWidth' properties
+Object.defineProperty(window, 'outerHeight', {
+    get: () => 1080,
+});
+Object.defineProperty(window, 'outerWidth', {
+    get: () => 1920,
+});
+
+// Override the 'screen' property
+Object.defineProperty(window, 'screen', {
+    get: () => ({
+        width: 1920,
+        height: 1080,
+        availWidth: 1920,
+        availHeight: 1040,
+        colorDepth: 24,
+        pixelDepth: 24
+    }),
+});
+
+// Override the 'devicePixelRatio' property
+Object.defineProperty(window, 'devicePixelRatio', {
+    get: () => 1,
+});
+
+// Override the 'innerHeight' and 'innerWidth' properties
+Object.defineProperty(window, 'innerHeight', {
+    get: () => 1040,
+});
+Object.defineProperty(window, 'innerWidth', {
+    get: () => 1920,
+});
+"""
+# Category tabs loaded at once; the pending list is short and Lidl is quick to flag bursts
+MAX_PARALLEL_PAGES = 2
+PRICE_RE = re.compile(r'(\d+[.,]\d+|\d+)')
+
+# Compound selectors resolve in one querySelector call. A compound match is the
+# first element in document order, which is fine for a card's single title or
+# quantity node. Price keeps the specific span first, because the loose
+# [class*="price"] would also match the wrapper that holds the old price.
+NAME_SELECTOR = 'h2[class*="_title_"], h3[class*="_title_"], .product-title, h2, h3'
+PRICE_SELECTOR = 'span[class*="_price_"]'
+PRICE_FALLBACK_SELECTOR = '.product-price, [class*="price"], span[class*="Price"]'
+QTY_SELECTOR = '.product-quantity, [class*="quantity"], [class*="weight"]'
+
+# Reads every card's fields in the browser with the selectors above; cards
+# without any price node (ad slots, placeholders) come back as null
+CARD_FIELDS_JS = """(els, [nameSel, priceSel, priceFallbackSel, qtySel]) => els.map(el => {
+    if (!el.querySelector('[class*="price"], [class*="Price"]')) return null;
+    const text = found => found ? found.innerText.trim() : '';
+    return {
+        name: text(el.querySelector(nameSel)),
+        price: text(el.querySelector(priceSel) || el.querySelector(priceFallbackSel)),
+        quantity: text(el.querySelector(qtySel)),
+    };
+})"""
+CARD_FIELD_SELECTORS = [NAME_SELECTOR, PRICE_SELECTOR, PRICE_FALLBACK_SELECTOR, QTY_SELECTOR]
+
+# Scrolls to the bottom and re-counts the cards (first selector that matches
+# anything) every interval inside the browser, returning once the count has
+# stayed the same for two checks in a row or the check budget runs out
+SCROLL_UNTIL_STABLE_JS = """async ([sels, maxChecks, intervalMs]) => {
+    const count = () => {
+        for (const sel of sels) {
+            const n = document.querySelectorAll(sel).length;
+            if (n) return n;
+        }
+        return 0;
+    };
+    let last = -1;
+    let stalled = 0;
+    for (let i = 0; i < maxChecks; i++) {
+        const n = count();
+        stalled = n === last && n > 0 ? stalled + 1 : 0;
+        if (stalled >= 2) return n;
+        last = n;
+        window.scrollTo(0, document.body.scrollHeight);
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    return count();
+}"""
+SCROLL_CHECK_INTERVAL_MS = 400
+MAX_SCROLL_CHECKS = 40
+SCROLL_CARD_SELECTORS = ['.product-grid-box-tile', 'li.grid-item', '[class*="product"]']
+
+def parse_static_products(html, category):
+    """Reads products from server-rendered grid HTML with the same selectors as the browser path"""
+    tree = HTMLParser(html)
+    cards = tree.css('.product-grid-box-tile') or tree.css('li.grid-item')
+    results = []
+    for card in cards:
+        name_el = card.css_first(NAME_SELECTOR)
+        price_el = card.css_first(PRICE_SELECTOR) or card.css_first(PRICE_FALLBACK_SELECTOR)
+        if not name_el or not price_el:
+            continue
+        name = name_el.text(strip=True)
+        price_match = PRICE_RE.search(price_el.text(strip=True))
+        if not name or not price_match:
+            continue
+        qty_el = card.css_first(QTY_SELECTOR)
+        results.append({
+            "name": name,
+            "price": float(price_match.group(1).replace(',', '.')),
+            "quantity": (qty_el.text(strip=True) if qty_el else "") or "1 unit",
+            "category": category,
+        })
+    return results
+
+def fetch_static_products():
+    """Fetches every category grid concurrently over HTTP/2.
+
+    Returns the parsed products and the (category, url) pairs whose grid
+    still needs a browser.
+    """
+    pages = asyncio.run(fetch_all_parallel([url for _, url in LIDL_CATEGORIES], max_concurrent=4))
+    products = []
+    pending = []
+    for (category, url), fetched in zip(LIDL_CATEGORIES, pages):
+        found = parse_static_products(fetched["html"], category) if fetched["status"] == 200 else []
+        if not found:
+            # Security page or a client-rendered grid
+            pending.append((category, url))
+            continue
+        print(f"🔎 Found {len(found)} products in {category} (HTTP)")
+        products.extend(found)
+    return products, pending
+
+def save_products(products):
+    """Inserts new products and updates changed prices in bulk"""
+    print(f"Processing {len(products)} products...")
+    inserted, updated, unchanged = upsert_products(products, "lidl")
+    print(f"SUCCESS: {inserted} inserted, {updated} price updates, {unchanged} unchanged")
+
+async def extract_lidl_products(page, category):
     """Extract products from Lidl category page"""
     try:
         # Wait for products to load
-        page.wait_for_selector('.product-grid-box-tile', timeout=15000)
+        await page.wait_for_selector('.product-grid-box-tile, li.grid-item', timeout=15000)
     except Exception as e:
         print(f"WARN Error waiting for products: {e}")
-        # Try alternative selectors
-        try:
-            page.wait_for_selector('li.grid-item', timeout=10000)
-        except Exception:
-            print("WARN Alternative selector also failed")
-
-    # Find all product elements
-    product_elements = page.query_selector_all('.product-grid-box-tile')
-    if not product_elements:
-        product_elements = page.query_selector_all('li.grid-item')
+
+    # One evaluate_all per card locator instead of several CDP calls per product
+    cards = await page.locator('.product-grid-box-tile').evaluate_all(CARD_FIELDS_JS, CARD_FIELD_SELECTORS)
+    if not cards:
+        cards = await page.locator('li.grid-item').evaluate_all(CARD_FIELDS_JS, CARD_FIELD_SELECTORS)
     
-    if not product_elements:
-        print("ERROR: No product elements found")
-        page.screenshot(path="lidl_debug.png", full_page=True)
-        with open("lidl_debug.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-        print("📸 Screenshot saved to lidl_debug.png, HTML saved to lidl_debug.html")
+    if not cards:
+        print(f"ERROR: No product elements found in {category}")
+        if DEBUG_ENABLED:
+            await save_debug_screenshot_async(page, "lidl_debug.png")
+            save_debug_html(await page.content(), "lidl_debug.html")
         return []
 
-    print(f"🔎 Found {len(product_elements)} products.")
+    print(f"🔎 Found {len(cards)} products in {category}.")
 
     results = []
-    for i, el in enumerate(product_elements, 1):
+    for i, card in enumerate(cards, 1):
         try:
-            # Extract product name
-            name_el = el.query_selector('h2[class*="_title_"]') or \
-                     el.query_selector('h3[class*="_title_"]') or \
-                     el.query_selector('.product-title') or \
-                     el.query_selector('h2') or \
-                     el.query_selector('h3')
-            
-            if not name_el:
-                print(f"WARN Skipped product {i}: Could not find name")
+            if card is None:
                 continue
-            name = name_el.inner_text().strip()
-            
+
+            name = card["name"]
             if not name:
-                print(f"WARN Skipped product {i}: Empty name")
+                print(f"WARN Skipped product {i}: Could not find name")
                 continue
 
-            # Extract price
-            price_el = el.query_selector('span[class*="_price_"]') or \
-                      el.query_selector('.product-price') or \
-                      el.query_selector('[class*="price"]') or \
-                      el.query_selector('span[class*="Price"]')
-            
-            if not price_el:
+            price_text = card["price"]
+            if not price_text:
                 print(f"WARN Skipped product {i}: Could not find price")
                 continue
-                
-            price_text = price_el.inner_text().strip()
+
             try:
                 # Extract numeric value from price text
-                import re
-                price_match = re.search(r'(\d+[.,]\d+|\d+)', price_text.replace(',', '.'))
+                price_match = PRICE_RE.search(price_text)
                 if price_match:
                     price = float(price_match.group(1).replace(',', '.'))
                 else:
@@ -101,11 +277,7 @@ def extract_lidl_products(page, category):
                 print(f"WARN Skipped product {i}: Could not parse price")
                 continue
 
-            # Extract quantity (if available)
-            quantity_el = el.query_selector('.product-quantity') or \
-                         el.query_selector('[class*="quantity"]') or \
-                         el.query_selector('[class*="weight"]')
-            quantity = quantity_el.inner_text().strip() if quantity_el else "1 unit"
+            quantity = card["quantity"] or "1 unit"
 
             results.append({
                 "name": name,
@@ -117,72 +289,77 @@ def extract_lidl_products(page, category):
             print(f"WARN Error processing product {i}: {e}")
     return results
 
-def scrape_lidl():
-    print("Starting Lidl scraper...")
-    with sync_playwright() as p:
-        # Use more stealthy browser settings
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
-                '--disable-extensions',
-                '--disable-plugins',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-renderer-backgrounding',
-                '--disable-field-trial-config',
-                '--disable-ipc-flooding-protection',
-                '--no-first-run',
-                '--no-default-browser-check',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-translate',
-                '--hide-scrollbars',
-                '--mute-audio',
-                '--no-zygote',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-background-networking',
-                '--disable-sync-preferences',
-                '--disable-background-downloads',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-domain-reliability',
-                '--disable-features=TranslateUI',
-                '--disable-hang-monitor',
-                '--disable-prompt-on-repost',
-                '--disable-background-timer-throttling',
-                '--disable-renderer-backgrounding',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--no-default-browser-check',
-                '--no-first-run',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-translate',
-                '--hide-scrollbars',
-                '--mute-audio',
-                '--no-zygote',
-                '--disable-gpu',
-                '--disable-software-rasterizer',
-                '--disable-background-networking',
-                '--disable-sync-preferences',
-                '--disable-background-downloads',
-                '--disable-client-side-phishing-detection',
-                '--disable-component-update',
-                '--disable-domain-reliability',
-                '--disable-features=TranslateUI'
-            ]
-        )
-        
-        # Create context with more stealthy settings
-        context = browser.new_context(
+async def scrape_category(context, semaphore, category, url):
+    """Loads one category in its own tab of the shared context and extracts its products"""
+    async with semaphore:
+        page = await context.new_page()
+        try:
+            print(f"LINK Navigating to {category} category...")
+            await page.goto(url, timeout=60000)
+            await asyncio.sleep(5)  # Wait longer for security check
+            print(f"Current URL after {category} navigation:", page.url)
+
+            # Check if we hit the security page
+            if not await page.evaluate(CHALLENGE_CLEARED_JS):
+                print(f"WARN Hit security check page on {category}, waiting for it to clear...")
+                if DEBUG_ENABLED:
+                    print("Please manually complete the security check in the browser window")
+                try:
+                    await page.wait_for_function(CHALLENGE_CLEARED_JS, timeout=CHALLENGE_TIMEOUT_MS, polling=1000)
+                except PlaywrightTimeoutError:
+                    print("ERROR: Still on security page, rerun with SCRAPER_DEBUG=1 to complete it manually")
+                    return []
+
+            # Handle store/location selection overlay if present
+            try:
+                close_button = await page.query_selector('button[aria-label*="Cerrar"]') or \
+                              await page.query_selector('button[aria-label*="close"]') or \
+                              await page.query_selector('button[data-test*="close"]') or \
+                              await page.query_selector('button[class*="close"]')
+                if close_button:
+                    await close_button.click()
+                    print("STORE Store selection closed")
+                    await asyncio.sleep(2)
+            except Exception:
+                print("WARN Store selection overlay not found.")
+
+            # Scroll to load more products
+            print(f"SCROLL Scrolling to load {category} products...")
+            count = await page.evaluate(
+                SCROLL_UNTIL_STABLE_JS,
+                [SCROLL_CARD_SELECTORS, MAX_SCROLL_CHECKS, SCROLL_CHECK_INTERVAL_MS],
+            )
+            print(f"CHART Found {count} products after scrolling {category}")
+
+            # The grid already stopped growing; only give in-flight requests
+            # a bounded moment to finish instead of sleeping a fixed 10s
+            try:
+                await page.wait_for_load_state("networkidle", timeout=5000)
+            except PlaywrightTimeoutError:
+                pass
+
+            # Try to take screenshot, but don't fail if it doesn't work
+            try:
+                await save_debug_screenshot_async(page, f"lidl_{category}_debug.png")
+            except Exception as e:
+                print(f"WARN Screenshot failed: {e}")
+
+            return await extract_lidl_products(page, category)
+        except Exception as e:
+            print(f"ERROR: Category {category} failed: {e}")
+            return []
+        finally:
+            await page.close()
+
+async def scrape_pending_categories(pending):
+    """Opens the browser once and scrapes the categories without a static grid in parallel tabs"""
+    async with async_playwright() as p:
+        # Use more stealthy browser settings; headful only when debugging locally
+        context = await p.chromium.launch_persistent_context(
+            PROFILE_DIR,
+            headless=not DEBUG_ENABLED,
+            channel="chromium",
+            args=list(LAUNCH_ARGS),
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
             locale="es-ES",
@@ -203,230 +380,70 @@ def scrape_lidl():
                 "Sec-Fetch-User": "?1"
             }
         )
-        
-        # Add comprehensive stealth scripts
-        context.add_init_script("""
-            // Override the 'webdriver' property
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined,
-            });
-            
-            // Override the 'plugins' property
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5],
-            });
-            
-            // Override the 'languages' property
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['es-ES', 'es', 'en'],
-            });
-            
-            // Override the 'permissions' property
-            const originalQuery = window.navigator.permissions.query;
-            window.navigator.permissions.query = (parameters) => (
-                parameters.name === 'notifications' ?
-                    Promise.resolve({ state: Notification.permission }) :
-                    originalQuery(parameters)
-            );
-            
-            // Override the 'chrome' property
-            Object.defineProperty(window, 'chrome', {
-                writable: true,
-                enumerable: true,
-                configurable: true,
-                value: {
-                    runtime: {},
-                },
-            });
-            
-            // Override the 'outerHeight' and 'outerWidth' properties
-            Object.defineProperty(window, 'outerHeight', {
-                get: () => 1080,
-            });
-            Object.defineProperty(window, 'outerWidth', {
-                get: () => 1920,
-            });
-            
-            // Override the 'screen' property
-            Object.defineProperty(window, 'screen', {
-                get: () => ({
-                    width: 1920,
-                    height: 1080,
-                    availWidth: 1920,
-                    availHeight: 1040,
-                    colorDepth: 24,
-                    pixelDepth: 24
-                }),
-            });
-            
-            // Override the 'devicePixelRatio' property
-            Object.defineProperty(window, 'devicePixelRatio', {
-                get: () => 1,
-            });
-            
-            // Override the 'innerHeight' and 'innerWidth' properties
-            Object.defineProperty(window, 'innerHeight', {
-                get: () => 1040,
-            });
-            Object.defineProperty(window, 'innerWidth', {
-                get: () => 1920,
-            });
-            
-            // Override the 'localStorage' property
-            Object.defineProperty(window, 'localStorage', {
-                get: () => ({
-                    getItem: () => null,
-                    setItem: () => {},
-                    removeItem: () => {},
-                    clear: () => {},
-                    key: () => null,
-                    length: 0
-                }),
-            });
-            
-            // Override the 'sessionStorage' property
-            Object.defineProperty(window, 'sessionStorage', {
-                get: () => ({
-                    getItem: () => null,
-                    setItem: () => {},
-                    removeItem: () => {},
-                    clear: () => {},
-                    key: () => null,
-                    length: 0
-                }),
-            });
-        """)
-        
-        page = context.new_page()
+
+        await block_heavy_resources_async(context)
+        await context.add_init_script(STEALTH_INIT_JS)
+
+        page = context.pages[0] if context.pages else await context.new_page()
 
         try:
             print("GLOBE Visiting Lidl homepage...")
             
             # First visit the main homepage to establish a session
-            page.goto(f"{BASE_URL}/es", timeout=60000)
-            time.sleep(3)
+            await page.goto(f"{BASE_URL}/es", timeout=60000)
+            await asyncio.sleep(3)
             print("Current URL after homepage:", page.url)
 
-            # Handle cookie popup if present
+            # Handle cookie popup if present; the tabs opened below share its cookies
             try:
-                cookie_button = page.query_selector('#onetrust-accept-btn-handler') or \
-                               page.query_selector('button:has-text("Aceptar")') or \
-                               page.query_selector('button:has-text("Accept")') or \
-                               page.query_selector('button[data-test*="accept"]')
+                cookie_button = await page.query_selector('#onetrust-accept-btn-handler') or \
+                               await page.query_selector('button:has-text("Aceptar")') or \
+                               await page.query_selector('button:has-text("Accept")') or \
+                               await page.query_selector('button[data-test*="accept"]')
                 if cookie_button:
-                    cookie_button.click()
+                    await cookie_button.click()
                     print("COOKIE Cookie popup accepted")
-                    time.sleep(2)
+                    await asyncio.sleep(2)
             except Exception:
                 print("WARN Cookie popup not found or already accepted.")
 
             # Try to navigate to a different category first
             print("LINK Navigating to a different category first...")
-            page.goto(f"{BASE_URL}/es/c/comprar-bebidas/c1857", timeout=60000)
-            time.sleep(3)
+            await page.goto(f"{BASE_URL}/es/c/comprar-bebidas/c1857", timeout=60000)
+            await asyncio.sleep(3)
             print("Current URL after drinks category:", page.url)
 
-            # Now navigate to the food category
-            print("LINK Navigating to food category...")
-            page.goto(f"{BASE_URL}/es/c/comprar-alimentos/c1856", timeout=60000)
-            time.sleep(5)  # Wait longer for security check
-            print("Current URL after category navigation:", page.url)
-
-            # Check if we hit the security page
-            page_content = page.content().lower()
-            if "security" in page.url.lower() or "myra" in page_content or "captcha" in page_content:
-                print("WARN Hit security check page, waiting for manual verification...")
-                print("Please manually complete the security check in the browser window")
-                print("Then press Enter to continue...")
-                input()
-                time.sleep(3)
-                
-                # Check if we're still on the security page
-                if "security" in page.url.lower() or "myra" in page.content().lower():
-                    print("ERROR: Still on security page after manual verification")
-                    return
-
-            # Handle store/location selection overlay if present
-            try:
-                close_button = page.query_selector('button[aria-label*="Cerrar"]') or \
-                              page.query_selector('button[aria-label*="close"]') or \
-                              page.query_selector('button[data-test*="close"]') or \
-                              page.query_selector('button[class*="close"]')
-                if close_button:
-                    close_button.click()
-                    print("STORE Store selection closed")
-                    time.sleep(2)
-            except Exception:
-                print("WARN Store selection overlay not found.")
-
-            # Try to find and click on a specific category if needed
-            try:
-                category_links = page.query_selector_all('a[href*="/c/"]')
-                if category_links:
-                    print("LINK Found category links, clicking first one...")
-                    category_links[0].click()
-                    time.sleep(3)
-                    print("Current URL after category click:", page.url)
-            except Exception as e:
-                print(f"WARN Error navigating to category: {e}")
-
-            # Scroll to load more products
-            print("SCROLL Scrolling to load products...")
-            for i in range(15):
-                page.mouse.wheel(0, 1000)
-                time.sleep(0.5)
-                
-                # Check if more products loaded
-                current_products = page.query_selector_all('.product-grid-box-tile')
-                if not current_products:
-                    current_products = page.query_selector_all('li.grid-item')
-                if not current_products:
-                    current_products = page.query_selector_all('[class*="product"]')
-                if i % 5 == 0:
-                    print(f"CHART Found {len(current_products)} products so far...")
-
-            # Wait for any remaining dynamic content
-            print("WAIT Waiting for dynamic content to load...")
-            page.wait_for_timeout(5000)
-            
-            # Final scroll to bottom to ensure everything is loaded
-            page.mouse.wheel(0, 2000)
-            time.sleep(2)
-
-            page.wait_for_timeout(3000)
-            
-            # Try to take screenshot, but don't fail if it doesn't work
-            try:
-                page.screenshot(path="lidl_debug.png", full_page=True)
-            except Exception as e:
-                print(f"WARN Screenshot failed: {e}")
-
-            products = extract_lidl_products(page, "alimentos")
-            if not products:
-                print("ERROR: No products found.")
-                return
-
-            print(f"Processing {len(products)} products...")
-            for i, product in enumerate(products, 1):
-                try:
-                    existing_product = get_product_by_name_and_store(product["name"], "lidl")
-                    if existing_product:
-                        if existing_product['price'] != product["price"]:
-                            print(f"RETRY [{i}] Price updated: {product['name']} {existing_product['price']}€ → {product['price']}€")
-                            update_product_price(existing_product['id'], product["price"])
-                        else:
-                            print(f"SKIP [{i}] No change: {product['name']}")
-                    else:
-                        insert_product(product["name"], product["price"], product["category"], "lidl", product["quantity"])
-                        print(f"SUCCESS: [{i}] Inserted: {product['name']} — {product['price']}€ ({product['quantity']})")
-                except Exception as e:
-                    print(f"ERROR: DB error on product {i}: {e}")
+            semaphore = asyncio.Semaphore(MAX_PARALLEL_PAGES)
+            results = await asyncio.gather(*(
+                scrape_category(context, semaphore, category, url) for category, url in pending
+            ))
+            products = [product for result in results for product in result]
+            for (category, _), result in zip(pending, results):
+                print(f"🔎 Found {len(result)} products in {category}")
+            return products
 
         except Exception as e:
             print(f"ERROR: Scraping failed: {e}")
+            return []
         finally:
-            browser.close()
-            print("FINISH Scraper finished.")
+            await context.close()
+
+def scrape_lidl():
+    print("Starting Lidl scraper...")
+    if not check_connection():
+        return
+
+    # Server-rendered grids need no browser at all
+    products, pending = fetch_static_products()
+    if pending:
+        print(f"WARN Static grid unavailable for {', '.join(c for c, _ in pending)}, falling back to the browser")
+        products.extend(asyncio.run(scrape_pending_categories(pending)))
+
+    if not products:
+        print("ERROR: No products found.")
+    else:
+        save_products(products)
+    print("FINISH Scraper finished.")
 
 if __name__ == "__main__":
     # Verify Playwright installation
@@ -1,84 +1,74 @@
 from playwright.sync_api import sync_playwright
-from utils.db import insert_product, get_product_by_name_and_store, update_product_price
+from utils.db import upsert_products
 from utils.proxy_handler import get_browser_with_proxy
+from utils.browser import block_heavy_resources
+
+# Drops the euro sign and turns the decimal comma into a dot in one pass
+PRICE_TRANSLATION = str.maketrans({"€": None, ",": "."})
+
+# Reads every product cell in a single evaluate; missing fields come back as null.
+# The unit price field is preferred, the older cell price is the fallback.
+PRODUCT_CELLS_JS = """els => els.map(el => {
+    const text = sel => {
+        const found = el.querySelector(sel);
+        return found ? found.innerText.trim() : null;
+    };
+    const img = el.querySelector('img');
+    const price = el.querySelector('.product-price__unit-price') || el.querySelector('.product-cell__price-price');
+    return {
+        name: text('.product-cell__description-name'),
+        image: img ? img.getAttribute('src') : null,
+        price: price ? price.innerText.trim() : null,
+    };
+})"""
 
 def scrape_mercadona():
     print("START Starting Mercadona scraper...")
     with sync_playwright() as p:
         browser = get_browser_with_proxy(p)
         page = browser.new_page()
+        # Image URLs are read from the src attribute, so the files themselves are never needed
+        block_heavy_resources(page.context)
         
-        page.goto("https://tienda.mercadona.es/")
+        page.goto("https://tienda.mercadona.es/", wait_until="domcontentloaded", timeout=30000)
         print("SUCCESS Page loaded successfully!")
 
-        page.wait_for_load_state("networkidle", timeout=120000)
-
-        # Wait for product cards to load
+        # The product cells are the readiness signal; networkidle can hang on analytics beacons
         page.wait_for_selector('.product-cell', timeout=60000)
 
-        products = page.query_selector_all(".product-cell")
+        products = page.locator(".product-cell").evaluate_all(PRODUCT_CELLS_JS)
         print(f"🔎 Found {len(products)} products")
 
-        inserted_count = 0
-        updated_count = 0
-        skipped_count = 0
+        parsed = []
 
         for i, product in enumerate(products, 1):
-            try:
-                # Product name
-                name_element = product.query_selector(".product-cell__description-name")
-                if not name_element:
-                    print(f"WARN Product {i}: Name not found!")
-                    continue
-                name = name_element.inner_text().strip()
-
-                # Product image
-                img_element = product.query_selector("img")
-                if img_element:
-                    image_url = img_element.get_attribute("src")
-                else:
-                    image_url = None
-                    print(f"WARN Product {i} '{name}': Image not found!")
-
-                # Try different price selectors
-                price_element = product.query_selector(".product-price__unit-price")  # Alternative price field
-                if not price_element:
-                    price_element = product.query_selector(".product-cell__price-price")  # Old one we tried
-
-                if not price_element:
-                    print(f"WARN Product {i} '{name}': Price not found!")
-                    continue
-
-                price_text = price_element.inner_text().strip()
+            name = product["name"]
+            if not name:
+                print(f"WARN Product {i}: Name not found!")
+                continue
 
-                if not price_text:
-                    print(f"WARN Product {i} '{name}': Price is empty!")
-                    continue
+            if not product["image"]:
+                print(f"WARN Product {i} '{name}': Image not found!")
 
-                price = float(price_text.replace("€", "").replace(",", ".").strip())
+            price_text = product["price"]
+            if price_text is None:
+                print(f"WARN Product {i} '{name}': Price not found!")
+                continue
 
-                # Check if product exists
-                existing_product = get_product_by_name_and_store(name, "mercadona")
-                
-                if existing_product:
-                    # Product exists, check for price change
-                    if existing_product['price'] != price:
-                        print(f"RETRY [{i}/{len(products)}] Price changed for {name}: {existing_product['price']}€ -> {price}€")
-                        update_product_price(existing_product['id'], price)
-                        updated_count += 1
-                    else:
-                        print(f"SKIP [{i}/{len(products)}] No changes for {name}")
-                        skipped_count += 1
-                else:
-                    # Product doesn't exist, insert it
-                    insert_product(name, price, "general", "mercadona", "1 unit")
-                    print(f"SUCCESS [{i}/{len(products)}] Added: {name} - {price}€")
-                    inserted_count += 1
+            if not price_text:
+                print(f"WARN Product {i} '{name}': Price is empty!")
+                continue
 
-            except Exception as e:
+            try:
+                price = float(price_text.translate(PRICE_TRANSLATION).strip())
+            except ValueError as e:
                 print(f"WARN Error processing product {i}: {e}")
                 continue
-        
+            parsed.append({"name": name, "price": price, "category": "general", "quantity": "1 unit"})
+
+        # One bulk lookup plus batched writes; a repeated name keeps its last price
+        inserted_count, updated_count, skipped_count = upsert_products(parsed, "mercadona")
+
         print(f"\nCHART Summary:")
         print(f"   Products added: {inserted_count}")
         print(f"   Products updated: {updated_count}")
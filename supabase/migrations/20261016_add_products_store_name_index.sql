@@ -0,0 +1,2 @@
+-- Composite index for the bulk (store_id, name in (...)) lookups done by the scrapers
+create index if not exists idx_products_store_id_name on public.products(store_id, name);
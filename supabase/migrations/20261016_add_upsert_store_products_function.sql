@@ -0,0 +1,68 @@
+-- Saves a whole scrape of one store in a single call and transaction: new names are
+-- inserted, rows whose price changed are updated, and the price history is rolled over.
+-- p_rows is a json array of {"name", "price", "category", "quantity"} objects; when a
+-- name repeats, its last occurrence wins.
+create or replace function public.upsert_store_products(p_store_id text, p_rows jsonb, p_city text default null)
+returns table (inserted integer, updated integer, unchanged integer)
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_total integer;
+begin
+    drop table if exists _scraped;
+    create temporary table _scraped on commit drop as
+    select distinct on (elem->>'name')
+        elem->>'name' as name,
+        (elem->>'price')::numeric as price,
+        elem->>'category' as category,
+        elem->>'quantity' as quantity
+    from jsonb_array_elements(p_rows) with ordinality as e(elem, ord)
+    order by elem->>'name', ord desc;
+    get diagnostics v_total = row_count;
+
+    insert into products (name, price, category, store_id, quantity, city)
+    select s.name, s.price, s.category, p_store_id, s.quantity, p_city
+    from _scraped s
+    where not exists (select 1 from products p where p.store_id = p_store_id and p.name = s.name);
+    get diagnostics inserted = row_count;
+
+    -- A name can exist more than once per store (e.g. one row per city); like the
+    -- client-side upsert, only its oldest row is compared and updated
+    with targets as (
+        select distinct on (p.name) p.id, s.price
+        from products p
+        join _scraped s on s.name = p.name
+        where p.store_id = p_store_id
+        order by p.name, p.created_at, p.id
+    ),
+    -- Unchanged prices are filtered out by the WHERE clause, so they are never written
+    changed as (
+        update products p
+        set price = t.price
+        from targets t
+        where p.id = t.id
+          and p.price is distinct from t.price
+        returning p.id, p.price
+    ), closed as (
+        update price_history h
+        set is_current = false, valid_until = now()
+        from changed c
+        where h.product_id = c.id and h.is_current
+    )
+    insert into price_history (product_id, price, store_id, is_current, recorded_at)
+    select c.id, c.price, p_store_id, true, now()
+    from changed c;
+    get diagnostics updated = row_count;
+
+    unchanged := greatest(v_total - inserted - updated, 0);
+    return next;
+end;
+$$;
+
+-- Only the scrapers, which use the service role key, write products. The function
+-- runs as its owner and bypasses RLS, so the default PUBLIC execute grant (which
+-- would let the anon key call it over /rpc) is taken away first.
+revoke execute on function public.upsert_store_products(text, jsonb, text) from public, anon, authenticated;
+grant execute on function public.upsert_store_products(text, jsonb, text) to service_role;
@@ -5,6 +5,8 @@ Fetches product images from multiple sources and updates Supabase database
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import sys
 import time
@@ -27,6 +29,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Patterns stripped from product names before searching, in order
+NAME_NOISE_PATTERNS = [
+    # Store names and house brands
+    re.compile(r'\b(El Corte Inglés|Carrefour|Dia|Lidl|Mercadona|Alcampo|BonÀrea|Bonpreu|Condis|Eroski)\b', re.IGNORECASE),
+    re.compile(r'\b(Classic|Extra|Premium|Selection|Al Punto|Nuestra Alacena|Marca Blanca|Hacendado|Deliplus|Basic|Natur)\b', re.IGNORECASE),
+    # Quantities
+    re.compile(r'\d+[.,]\d+\s*(kg|g|l|ml|cl|pack|units?|x)\b', re.IGNORECASE),
+    re.compile(r'\(\d+\s*(kg|g|l|ml|cl|pack|units?|x)\)', re.IGNORECASE),
+    # Packaging terms
+    re.compile(r'\b(botella|bolsa|caja|sobre|bandeja|frasco|lata|brik|pack|envase)\b', re.IGNORECASE),
+    # Prices
+    re.compile(r'\d+[.,]\d+\s*€'),
+    re.compile(r'1 KILO A \d+[.,]\d+\s*€', re.IGNORECASE),
+    re.compile(r'1 LITRO A \d+[.,]\d+\s*€', re.IGNORECASE),
+]
+WHITESPACE_RE = re.compile(r'\s+')
+
 class ProductImageUpdater:
     def __init__(self):
         """Initialize the updater with Supabase connection and API keys"""
@@ -48,24 +67,22 @@ class ProductImageUpdater:
         
         # Open Food Facts API base URL
         self.openfoodfacts_api = "https://world.openfoodfacts.org/api/v0/product/"
+
+        # One pooled session for every image API call: connections and TLS
+        # sessions are kept alive between products instead of reopened per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+        )
+        self.session.mount('https://', adapter)
     
     def clean_product_name(self, name: str) -> str:
         """Clean product name for better search results"""
-        # Remove common store prefixes and suffixes
-        name = re.sub(r'\b(El Corte Inglés|Carrefour|Dia|Lidl|Mercadona|Alcampo|BonÀrea|Bonpreu|Condis|Eroski)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\b(Classic|Extra|Premium|Selection|Al Punto|Nuestra Alacena|Marca Blanca|Hacendado|Deliplus|Basic|Natur)\b', '', name, flags=re.IGNORECASE)
-        
-        # Remove quantity information but keep important product info
-        name = re.sub(r'\d+[.,]\d+\s*(kg|g|l|ml|cl|pack|units?|x)\b', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'\(\d+\s*(kg|g|l|ml|cl|pack|units?|x)\)', '', name, flags=re.IGNORECASE)
-        
-        # Remove common packaging terms but keep important ones
-        name = re.sub(r'\b(botella|bolsa|caja|sobre|bandeja|frasco|lata|brik|pack|envase)\b', '', name, flags=re.IGNORECASE)
-        
-        # Remove price information
-        name = re.sub(r'\d+[.,]\d+\s*€', '', name)
-        name = re.sub(r'1 KILO A \d+[.,]\d+\s*€', '', name, flags=re.IGNORECASE)
-        name = re.sub(r'1 LITRO A \d+[.,]\d+\s*€', '', name, flags=re.IGNORECASE)
+        # Remove store names, quantities, packaging terms and prices
+        for pattern in NAME_NOISE_PATTERNS:
+            name = pattern.sub('', name)
         
         # Keep important brand names and product types
         # Don't remove well-known brands that help with search
@@ -81,7 +98,7 @@ class ProductImageUpdater:
                           'LADRÓN DE MANZANAS', 'MUMM', 'EL GAITERO']
         
         # Clean up extra spaces and punctuation
-        name = re.sub(r'\s+', ' ', name)
+        name = WHITESPACE_RE.sub(' ', name)
         name = name.strip()
         
         # If the cleaned name is too short, try to keep some brand info
@@ -109,7 +126,7 @@ class ProductImageUpdater:
                 'page_size': 5  # Get top 5 results
             }
             
-            response = requests.get(search_url, params=params, timeout=10)
+            response = self.session.get(search_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -156,7 +173,7 @@ class ProductImageUpdater:
                 'rights': 'cc_publicdomain|cc_attribute|cc_sharealike|cc_noncommercial|cc_nonderived'  # Better quality images
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -213,7 +230,7 @@ class ProductImageUpdater:
                 'size': 'Large'           # Prefer large images
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -269,7 +286,7 @@ class ProductImageUpdater:
                 'orientation': 'landscape'
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -315,7 +332,7 @@ class ProductImageUpdater:
                         'siteSearchFilter': 'i'  # Include only these sites
                     }
                     
-                    response = requests.get(url, params=params, timeout=10)
+                    response = self.session.get(url, params=params, timeout=10)
                     response.raise_for_status()
                     
                     data = response.json()
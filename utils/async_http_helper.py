@@ -0,0 +1,29 @@
+import asyncio
+import httpx
+from utils.logger import log_debug_message
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+}
+
+async def fetch_all_parallel(urls, max_concurrent=20, headers=None):
+    """Fetches all URLs concurrently over a single pooled HTTP/2 client.
+
+    Returns one {"url", "status", "html"} dict per URL, in the same order.
+    Failed requests are returned with status None and empty html.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async with httpx.AsyncClient(http2=True, timeout=15, headers=headers or DEFAULT_HEADERS, follow_redirects=True) as client:
+        async def fetch(url):
+            async with semaphore:
+                try:
+                    response = await client.get(url)
+                    return {"url": url, "status": response.status_code, "html": response.text}
+                except httpx.HTTPError as e:
+                    log_debug_message(f"❌ Exception fetching {url}: {e}")
+                    return {"url": url, "status": None, "html": ""}
+
+        return await asyncio.gather(*(fetch(url) for url in urls))
@@ -0,0 +1,39 @@
+from urllib.parse import urlparse
+
+# None of the scrapers read images, fonts, styles or media, and trackers only
+# slow the page down, so these requests are aborted before they hit the network
+BLOCKED_RESOURCE_TYPES = {"image", "font", "stylesheet", "media"}
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "criteo.com",
+    "bing.com",
+)
+
+def _should_block(request):
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlparse(request.url).hostname or ""
+    return any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS)
+
+def block_heavy_resources(context):
+    """Aborts image/font/css/media and tracker requests for every page of a sync context."""
+    def handle(route):
+        if _should_block(route.request):
+            route.abort()
+        else:
+            route.continue_()
+    context.route("**/*", handle)
+
+async def block_heavy_resources_async(context):
+    """Async Playwright variant of block_heavy_resources."""
+    async def handle(route):
+        if _should_block(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+    await context.route("**/*", handle)
@@ -1,21 +1,45 @@
 from dotenv import load_dotenv
 import os
-from supabase import create_client
-import datetime
+from supabase import create_client, acreate_client, ClientOptions, AsyncClientOptions
+import asyncio
+import httpx
+from utils.logger import log_debug_message
 
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
-# Path to the debug log file
-DEBUG_LOG_FILE = "debug_log.txt"
+# Built once per process and handed to the client, so every helper below reuses
+# the same keep-alive HTTP/2 connections instead of paying a TLS handshake per row
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60)
+_http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=30)
+supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY, options=ClientOptions(httpx_client=_http_client))
 
-def log_debug_message(message):
-    """Logs a debug message to a file."""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(DEBUG_LOG_FILE, "a", encoding="utf-8") as log_file:
-        log_file.write(f"[{timestamp}] {message}\n")
+# Set after the first successful probe; the multi-market runner starts several
+# scrapers in one process and they all share this client
+_connection_ok = False
+
+def check_connection():
+    """Probes the products table so a bad .env fails fast, before a browser starts.
+
+    Skipped when SCRAPER_SKIP_HEALTHCHECK is set (e.g. a scheduler that already checked)
+    or once a probe has succeeded in this process. Failures are not remembered, so a
+    later scraper retries after a transient outage.
+    """
+    global _connection_ok
+    if _connection_ok or os.getenv("SCRAPER_SKIP_HEALTHCHECK"):
+        return True
+    print("RETRY Checking Supabase connection...")
+    try:
+        # HEAD request without a count: PostgREST answers with headers only
+        supabase.table("products").select("id", head=True).limit(1).execute()
+        print("SUCCESS Supabase connection successful")
+        _connection_ok = True
+        return True
+    except Exception as e:
+        print(f"ERROR Supabase connection failed: {str(e)}")
+        print("Please check your .env file contains valid SUPABASE_URL and SUPABASE_KEY")
+        return False
 
 def get_categories_by_store(store_id):
     """Fetches all categories for a given store_id from the Supabase 'categories' table."""
@@ -105,6 +129,257 @@ def insert_product(name, price, category, store_id, quantity=None, city=None):
         print(f"❌ Exception during Supabase insert: {e}")
         log_debug_message(f"❌ Exception during Supabase insert: {e}")
 
+# Keeps the PostgREST "name=in.(...)" query string well under URL limits
+LOOKUP_CHUNK_SIZE = 200
+
+def get_products_by_names_and_store(names, store_id):
+    """Fetches all products of a store whose name is in names, keyed by name (None on error)."""
+    names = list(dict.fromkeys(names))
+    found = {}
+    try:
+        for start in range(0, len(names), LOOKUP_CHUNK_SIZE):
+            chunk = names[start:start + LOOKUP_CHUNK_SIZE]
+            # Oldest row first, so setdefault keeps the same row upsert_store_products updates
+            response = supabase.table("products").select("*").eq("store_id", store_id).in_("name", chunk) \
+                .order("created_at").order("id").execute()
+            if hasattr(response, "data") and response.data:
+                for product in response.data:
+                    found.setdefault(product["name"], product)
+    except Exception as e:
+        log_debug_message(f"❌ Exception in get_products_by_names_and_store: {e}")
+        return None
+    return found
+
+# PostgREST caps a single response (1000 rows on Supabase), so a whole store is read in pages
+STORE_PAGE_SIZE = 1000
+
+def get_products_by_store(store_id):
+    """Fetches id, name and price of every product of a store, keyed by name (None on error)."""
+    found = {}
+    start = 0
+    try:
+        while True:
+            # Oldest row first, so a repeated name resolves to the same row as in the upserts
+            response = supabase.table("products").select("id,name,price").eq("store_id", store_id) \
+                .order("created_at").order("id").range(start, start + STORE_PAGE_SIZE - 1).execute()
+            rows = response.data or []
+            for product in rows:
+                found.setdefault(product["name"], product)
+            if len(rows) < STORE_PAGE_SIZE:
+                return found
+            start += STORE_PAGE_SIZE
+    except Exception as e:
+        log_debug_message(f"❌ Exception in get_products_by_store: {e}")
+        return None
+
+def _split_products(incoming, existing, store_id, city):
+    """Splits scraped products into rows to insert and existing rows whose price changed."""
+    new_rows = []
+    changed_rows = []
+    for name, product in incoming.items():
+        current = existing.get(name)
+        if current is None:
+            new_rows.append({
+                "name": name,
+                "price": product["price"],
+                "category": product.get("category"),
+                "store_id": store_id,
+                "quantity": product.get("quantity"),
+                "city": city
+            })
+        elif current["price"] != product["price"]:
+            changed_rows.append({**current, "price": product["price"]})
+    return new_rows, changed_rows
+
+def _price_history_rows(changed_rows, store_id):
+    return [{
+        "product_id": row["id"],
+        "price": row["price"],
+        "store_id": store_id,
+        "is_current": True,
+        "recorded_at": "now()"
+    } for row in changed_rows]
+
+def _rpc_params(incoming, store_id, city):
+    """Arguments of the upsert_store_products RPC for the deduplicated incoming products."""
+    return {
+        "p_store_id": store_id,
+        "p_rows": [{
+            "name": name,
+            "price": product["price"],
+            "category": product.get("category"),
+            "quantity": product.get("quantity")
+        } for name, product in incoming.items()],
+        "p_city": city
+    }
+
+def upsert_products(products, store_id, city=None):
+    """Inserts new products and updates changed prices in a handful of bulk requests.
+
+    products is a list of {"name", "price", "category", "quantity"} dicts.
+    Returns (inserted, updated, unchanged) counts.
+    """
+    # The last occurrence of a name wins, like the per-product loop it replaces
+    incoming = {p["name"]: p for p in products}
+
+    # One round trip and one transaction when the upsert_store_products function
+    # is deployed; otherwise fall back to the lookup + bulk writes below
+    try:
+        response = supabase.rpc("upsert_store_products", _rpc_params(incoming, store_id, city)).execute()
+        counts = response.data[0]
+        log_debug_message(f"✅ upsert_store_products for {store_id}: {counts}")
+        return counts["inserted"], counts["updated"], counts["unchanged"]
+    except Exception as e:
+        log_debug_message(f"❌ upsert_store_products RPC failed, using client-side upsert: {e}")
+
+    existing = get_products_by_names_and_store(incoming.keys(), store_id)
+    if existing is None:
+        # Without the lookup every product would look new and get inserted twice
+        return 0, 0, 0
+    new_rows, changed_rows = _split_products(incoming, existing, store_id, city)
+
+    try:
+        if new_rows:
+            supabase.table("products").insert(new_rows).execute()
+            log_debug_message(f"✅ Inserted {len(new_rows)} products for {store_id}")
+
+        if changed_rows:
+            changed_ids = [row["id"] for row in changed_rows]
+            supabase.table("products").upsert(changed_rows).execute()
+            supabase.table("price_history").update({
+                "is_current": False,
+                "valid_until": "now()"
+            }).in_("product_id", changed_ids).eq("is_current", True).execute()
+            supabase.table("price_history").insert(_price_history_rows(changed_rows, store_id)).execute()
+            log_debug_message(f"✅ Updated {len(changed_rows)} prices for {store_id}")
+    except Exception as e:
+        print(f"❌ Exception during Supabase bulk upsert: {e}")
+        log_debug_message(f"❌ Exception in upsert_products: {e}")
+
+    return len(new_rows), len(changed_rows), len(incoming) - len(new_rows) - len(changed_rows)
+
+# Async client for scrapers running on asyncio. It wraps a pooled httpx.AsyncClient,
+# so all requests of a run share keep-alive connections. A client is bound to the
+# event loop it was created on, so one is created per loop (i.e. per asyncio.run).
+# Several scrapers can run at once, each on its own thread and loop, so entries are
+# only ever removed by the loop that owns them, through run_async.
+_async_clients = {}
+
+async def get_async_supabase():
+    """Returns the async Supabase client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=30)
+        client = await acreate_client(
+            SUPABASE_URL, SUPABASE_SERVICE_KEY, options=AsyncClientOptions(httpx_client=http_client)
+        )
+        entry = _async_clients[loop] = (client, http_client)
+    return entry[0]
+
+async def close_async_supabase():
+    """Closes the running loop's async client, if it created one."""
+    entry = _async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
+
+def run_async(coro):
+    """asyncio.run for code using the async DB helpers; the loop's client is closed before the loop ends."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_async_supabase()
+    return asyncio.run(main())
+
+async def get_product_by_name_and_store_async(name, store_id):
+    """Async variant of get_product_by_name_and_store."""
+    try:
+        client = await get_async_supabase()
+        response = await client.table("products").select("*").eq("name", name).eq("store_id", store_id).limit(1).execute()
+        if hasattr(response, "data") and response.data:
+            return response.data[0]
+        return None
+    except Exception as e:
+        log_debug_message(f"❌ Exception in get_product_by_name_and_store_async: {e}")
+        return None
+
+async def insert_product_async(name, price, category, store_id, quantity=None, city=None):
+    """Async variant of insert_product."""
+    data = {
+        "name": name,
+        "price": price,
+        "category": category,
+        "store_id": store_id,
+        "quantity": quantity,
+        "city": city
+    }
+    try:
+        client = await get_async_supabase()
+        result = await client.table("products").insert(data).execute()
+        if hasattr(result, "data") and result.data:
+            log_debug_message(f"✅ Successfully inserted: {name}")
+        else:
+            print(f"❌ Failed to insert: {name}")
+            log_debug_message(f"❌ Failed to insert: {name}")
+    except Exception as e:
+        print(f"❌ Exception during Supabase insert: {e}")
+        log_debug_message(f"❌ Exception during Supabase insert: {e}")
+
+async def upsert_products_async(products, store_id, city=None):
+    """Async variant of upsert_products; in the fallback path the name lookups run concurrently."""
+    incoming = {p["name"]: p for p in products}
+    names = list(incoming)
+    existing = {}
+    try:
+        client = await get_async_supabase()
+    except Exception as e:
+        log_debug_message(f"❌ Exception in upsert_products_async client: {e}")
+        return 0, 0, 0
+
+    # Same single-transaction RPC as upsert_products, with the same fallback
+    try:
+        response = await client.rpc("upsert_store_products", _rpc_params(incoming, store_id, city)).execute()
+        counts = response.data[0]
+        log_debug_message(f"✅ upsert_store_products for {store_id}: {counts}")
+        return counts["inserted"], counts["updated"], counts["unchanged"]
+    except Exception as e:
+        log_debug_message(f"❌ upsert_store_products RPC failed, using client-side upsert: {e}")
+
+    try:
+        responses = await asyncio.gather(*(
+            client.table("products").select("*").eq("store_id", store_id).in_("name", names[start:start + LOOKUP_CHUNK_SIZE])
+                .order("created_at").order("id").execute()
+            for start in range(0, len(names), LOOKUP_CHUNK_SIZE)
+        ))
+        for response in responses:
+            for product in response.data or []:
+                existing.setdefault(product["name"], product)
+    except Exception as e:
+        log_debug_message(f"❌ Exception in upsert_products_async lookup: {e}")
+        return 0, 0, 0
+    new_rows, changed_rows = _split_products(incoming, existing, store_id, city)
+
+    try:
+        if new_rows:
+            await client.table("products").insert(new_rows).execute()
+            log_debug_message(f"✅ Inserted {len(new_rows)} products for {store_id}")
+
+        if changed_rows:
+            changed_ids = [row["id"] for row in changed_rows]
+            await client.table("products").upsert(changed_rows).execute()
+            await client.table("price_history").update({
+                "is_current": False,
+                "valid_until": "now()"
+            }).in_("product_id", changed_ids).eq("is_current", True).execute()
+            await client.table("price_history").insert(_price_history_rows(changed_rows, store_id)).execute()
+            log_debug_message(f"✅ Updated {len(changed_rows)} prices for {store_id}")
+    except Exception as e:
+        print(f"❌ Exception during Supabase bulk upsert: {e}")
+        log_debug_message(f"❌ Exception in upsert_products_async: {e}")
+
+    return len(new_rows), len(changed_rows), len(incoming) - len(new_rows) - len(changed_rows)
+
 def get_city_stats():
     """Get statistics about products per city"""
     try:
@@ -125,6 +400,29 @@ def get_city_stats():
         log_debug_message(f"❌ Exception in get_city_stats: {e}")
         return {}
 
+def get_city_stats_since(since, base_counts):
+    """Adds products created at or after since (ISO timestamp) to base_counts; None on error"""
+    city_counts = dict(base_counts)
+    start = 0
+    try:
+        # A full run inserts more rows than one PostgREST response holds, so read in pages
+        while True:
+            response = supabase.table("products").select("city").gte("created_at", since) \
+                .order("id").range(start, start + STORE_PAGE_SIZE - 1).execute()
+            rows = response.data or []
+            for product in rows:
+                city = product.get("city", "Unknown")
+                city_counts[city] = city_counts.get(city, 0) + 1
+            if len(rows) < STORE_PAGE_SIZE:
+                break
+            start += STORE_PAGE_SIZE
+    except Exception as e:
+        log_debug_message(f"❌ Exception in get_city_stats_since: {e}")
+        return None
+
+    log_debug_message(f"📊 City stats since {since}: {city_counts}")
+    return city_counts
+
 if __name__ == "__main__":
     # Example test
     insert_product(
@@ -0,0 +1,38 @@
+import os
+from utils.logger import log_debug_message
+
+# Debug artifacts are only written when SCRAPER_DEBUG is set, and at most
+# MAX_DEBUG_DUMPS times per run so one bad page can't fill the disk
+DEBUG_ENABLED = bool(os.getenv("SCRAPER_DEBUG"))
+MAX_DEBUG_DUMPS = 3
+
+_dump_count = 0
+
+def _claim_dump():
+    global _dump_count
+    if not DEBUG_ENABLED or _dump_count >= MAX_DEBUG_DUMPS:
+        return False
+    _dump_count += 1
+    return True
+
+def save_debug_html(html, filename):
+    """Writes the HTML to filename when debugging is enabled."""
+    if not _claim_dump():
+        return
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(html)
+    log_debug_message(f"💾 HTML saved as {filename}")
+
+def save_debug_screenshot(page, path):
+    """Saves a full-page screenshot when debugging is enabled."""
+    if not _claim_dump():
+        return
+    page.screenshot(path=path, full_page=True)
+    log_debug_message(f"📸 Screenshot saved to {path}")
+
+async def save_debug_screenshot_async(page, path):
+    """Async Playwright variant of save_debug_screenshot."""
+    if not _claim_dump():
+        return
+    await page.screenshot(path=path, full_page=True)
+    log_debug_message(f"📸 Screenshot saved to {path}")
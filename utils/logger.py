@@ -1,8 +1,24 @@
-import datetime
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 DEBUG_LOG_FILE = "debug_log.txt"
 
+# Callers only enqueue the record; a background listener thread does the file
+# writes, so concurrent scrapers never block on (or contend for) the log file
+_log_queue = queue.SimpleQueue()
+_file_handler = logging.FileHandler(DEBUG_LOG_FILE, encoding="utf-8", delay=True)
+_file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+_listener = QueueListener(_log_queue, _file_handler)
+_listener.start()
+# Flush whatever is still queued when the process exits
+atexit.register(_listener.stop)
+
+_logger = logging.getLogger("scraper.debug")
+_logger.setLevel(logging.DEBUG)
+_logger.propagate = False
+_logger.addHandler(QueueHandler(_log_queue))
+
 def log_debug_message(message):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(DEBUG_LOG_FILE, "a", encoding="utf-8") as log_file:
-        log_file.write(f"[{timestamp}] {message}\n")
+    _logger.debug(message)
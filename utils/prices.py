@@ -0,0 +1,18 @@
+DIGITS = "0123456789"
+
+class PriceChars(dict):
+    """str.translate table that deletes every character without an explicit entry"""
+    def __missing__(self, codepoint):
+        # Remember the deletion so each foreign character is looked up once
+        self[codepoint] = None
+        return None
+
+def price_chars(keep, replace=None):
+    """Builds a PriceChars table keeping the characters in keep.
+
+    replace maps a character to its substitute, or to None to drop it.
+    """
+    table = PriceChars({ord(c): ord(c) for c in keep})
+    for char, substitute in (replace or {}).items():
+        table[ord(char)] = ord(substitute) if substitute else None
+    return table